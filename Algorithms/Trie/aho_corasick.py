@@ -0,0 +1,210 @@
+"""Aho-Corasick multi-pattern matching, built on Trie.
+http://en.wikipedia.org/wiki/Aho-Corasick_algorithm
+
+Looking for a dozen keywords in a text with one substring search per
+keyword reads the text a dozen times. The Aho-Corasick automaton finds
+all keywords in a single pass over the text.
+
+The keywords are stored in a Trie. Each node gets:
+- a failure link: the node of the longest proper suffix of the node
+  prefix which is also in the trie. When the next character of the text
+  has no child in the current node, we follow the failure links
+  instead of restarting from the root.
+- an output list: the keywords ending at this node, including the ones
+  reached through the failure links (e.g. "he" in "she").
+
+The transitions are cached on each node the first time they are used,
+so that scanning a text costs one dict lookup per character.
+
+This python loop over the characters is still slower than one C substring
+search per keyword, "keyword in text", up to about 200 keywords for texts
+of the size of a tweet. Therefore, search uses the substring searches
+below SUBSTRING_MAXSIZE keywords, and the automaton is only built when it
+is used: by finditer, or by search with more keywords.
+"""
+
+import unittest
+from collections import deque
+
+from trie import Trie
+
+# search uses "keyword in text" for fewer keywords
+SUBSTRING_MAXSIZE = 150
+
+
+class _State(Trie):
+    """Trie node, with the attributes of an automaton state."""
+
+    def __init__(self):
+        super(_State, self).__init__()
+        self._fail = None
+        self._outputs = ()
+        self._delta = dict()    # cached transitions
+
+
+class AhoCorasick(object):
+    """Automaton matching a set of keywords in texts.
+
+    Example:
+      automaton = AhoCorasick(['python', 'pandas', '#bigdata'])
+      automaton.search(tweet.lower())
+    """
+
+    def __init__(self, keywords):
+        """Raises: ValueError for an empty keyword."""
+        keywords = set(keywords)
+        if '' in keywords:
+            raise ValueError('empty keyword')
+        self._keywords = sorted(keywords)
+        # substring searches, see SUBSTRING_MAXSIZE
+        self._substrings = len(keywords) < SUBSTRING_MAXSIZE
+        self._root = None   # built by _automaton
+
+    def _automaton(self):
+        """Returns: the root state, built on the first call."""
+        if self._root is None:
+            self._root = _State.from_iterable(self._keywords,
+                                              presorted=True)
+            self._build_links()
+        return self._root
+
+    def _build_links(self):
+        """Set the failure links and outputs, in breadth-first order,
+        so that the failure link of a node is ready before its children.
+        """
+        root = self._root
+        root._fail = root
+        todo = deque()
+        for char, child in root._children.iteritems():
+            child._fail = root
+            todo.append((child, char))
+        while todo:
+            node, word = todo.popleft()
+            outputs = node._fail._outputs
+            if node._valid:
+                outputs = (word,) + outputs
+            node._outputs = outputs
+            for char, child in node._children.iteritems():
+                fail = node._fail
+                while fail is not root and char not in fail._children:
+                    fail = fail._fail
+                child._fail = fail._children.get(char, root)
+                todo.append((child, word + char))
+
+    def _next(self, node, char):
+        """Returns: state reached from node when reading char."""
+        root = self._root
+        state = node
+        while state is not root and char not in state._children:
+            state = state._fail
+        state = state._children.get(char, root)
+        node._delta[char] = state
+        return state
+
+    def finditer(self, text):
+        """Yields: (start index, keyword) for each keyword occurrence
+        in text, in the order of the end index.
+        """
+        node = self._automaton()
+        for end, char in enumerate(text):
+            state = node._delta.get(char)
+            node = state if state is not None else self._next(node, char)
+            for keyword in node._outputs:
+                yield end + 1 - len(keyword), keyword
+
+    def search(self, text):
+        """Returns: the set of keywords found in text."""
+        if self._substrings:
+            return set([keyword for keyword in self._keywords
+                        if keyword in text])
+        found = set()
+        node = self._automaton()
+        delta_next = self._next
+        for char in text:
+            state = node._delta.get(char)
+            node = state if state is not None else delta_next(node, char)
+            if node._outputs:
+                found.update(node._outputs)
+        return found
+
+    def match_many(self, texts):
+        """Yields: the set of keywords found in each text.
+
+        texts can be any iterable, e.g. an open file,
+        so that millions of texts can be filtered without loading them.
+        """
+        search = self.search
+        for text in texts:
+            yield search(text)
+
+
+class AhoCorasickCase(unittest.TestCase):
+
+    def setUp(self):
+        self.automaton = AhoCorasick(["he", "she", "his", "hers"])
+
+    def test_finditer(self):
+        self.assertEqual(list(self.automaton.finditer("ushers")),
+                         [(1, "she"), (2, "he"), (2, "hers")])
+        self.assertEqual(list(self.automaton.finditer("ahishers")),
+                         [(1, "his"), (3, "she"), (4, "he"), (4, "hers")])
+        self.assertEqual(list(self.automaton.finditer("xyz")), [])
+
+    def test_search(self):
+        self.assertEqual(self.automaton.search("ushers"),
+                         set(["she", "he", "hers"]))
+        self.assertEqual(self.automaton.search(""), set())
+
+    def test_match_many(self):
+        texts = ["this is his", "nothing", "she sells"]
+        self.assertEqual(list(self.automaton.match_many(texts)),
+                         [set(["his"]), set(), set(["she", "he"])])
+
+    def test_empty_keyword(self):
+        self.assertRaises(ValueError, AhoCorasick, ['', 'a'])
+
+    def test_many_keywords(self):
+        # automaton and substring searches
+        keywords = ['k{0}x'.format(i) for i in range(2 * SUBSTRING_MAXSIZE)]
+        text = 'k1x k10 k22x k299x k2x'
+        for n in [SUBSTRING_MAXSIZE - 1, SUBSTRING_MAXSIZE]:
+            automaton = AhoCorasick(keywords[:n])
+            expected = set(keyword for keyword in keywords[:n]
+                           if keyword in text)
+            self.assertEqual(automaton.search(text), expected)
+            self.assertEqual(set(keyword for start, keyword
+                                 in automaton.finditer(text)), expected)
+        self.assertFalse(automaton._substrings)
+
+    def test_lazy(self):
+        automaton = AhoCorasick(['he', 'she'])
+        self.assertEqual(automaton.search('ushers'), set(['he', 'she']))
+        self.assertIsNone(automaton._root)
+        self.assertEqual(list(automaton.finditer('ushers')),
+                         [(1, 'she'), (2, 'he')])
+        self.assertIsNotNone(automaton._root)
+
+    def test_against_find(self):
+        keywords = ["#python", "python", "pandas", "data", "ata", "a"]
+        automaton = AhoCorasick(keywords)
+        text = "big data with #python and pandas, bigdata!"
+        expected = set(keyword for keyword in keywords if keyword in text)
+        self.assertEqual(automaton.search(text), expected)
+        for start, keyword in automaton.finditer(text):
+            self.assertEqual(text[start:start + len(keyword)], keyword)
+
+
+if __name__ == "__main__":
+
+    import sys
+
+    if len(sys.argv) > 2:
+        # python aho_corasick.py tweets.txt python pandas '#bigdata'
+        # prints the lines containing at least one of the keywords
+        automaton = AhoCorasick(sys.argv[2:])
+        with open(sys.argv[1]) as ifile:
+            for line in ifile:
+                if automaton.search(line.lower()):
+                    sys.stdout.write(line)
+    else:
+        unittest.main()
@@ -0,0 +1,188 @@
+"""Benchmark of the trie layouts.
+
+For each layout and each dictionary size, measures:
+- insert throughput (words per second). For MappedTrie, this is the
+  time to build a Trie and write it to disk, in a separate process.
+  The other measurements are done after mapping the file.
+- membership latency: "word in trie", half of the queries are misses.
+- prefix query latency: first 10 completions of a 3-letter prefix.
+- traversal time: get_words on the whole trie.
+- peak RSS and number of nodes.
+
+Each measurement runs in a fresh process, so that the peak RSS only
+contains the trie being measured, on top of the base RSS of the
+process before building the trie.
+
+The results are printed as one JSON record per line, and appended to
+the output file if one is given, so that results from different
+revisions can be compared.
+
+Usage:
+  python benchmark.py                     # generated words
+  python benchmark.py -w /usr/share/dict/words -s 10000,100000,-1
+  python benchmark.py -l Trie,RadixTrie -o results.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+from argparse import ArgumentParser
+from itertools import islice
+
+# benchmark_process is shared with the benchmarks of the parent directory,
+# appended so that the trie modules of this directory come first
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmark_process import peak_rss_mb, run as _in_new_process
+from trie import Trie, read_words
+from compact_trie import CompactTrie
+from radix_trie import RadixTrie
+from mapped_trie import write_trie, open_trie
+
+LAYOUTS = ['Trie', 'CompactTrie', 'RadixTrie', 'MappedTrie']
+
+
+def generate_words(nwords, seed=0):
+    """Returns: a sorted list of nwords distinct random words.
+
+    The words are built from random stems and common english suffixes,
+    so that, like in a real dictionary, many words share a prefix.
+    """
+    rand = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    suffixes = ['', 's', 'ed', 'ing', 'er', 'ers', 'ly', 'ness', 'ation',
+                'able', 'ism', 'ist']
+    words = set()
+    while len(words) < nwords:
+        stem = ''.join(rand.choice(letters)
+                       for i in range(rand.randint(2, 8)))
+        for suffix in rand.sample(suffixes, 4):
+            words.add(stem + suffix)
+    return sorted(words)[:nwords]
+
+
+def write_mapped(words, filename):
+    """Write the trie of words to filename.
+
+    Returns: the time it took, in seconds.
+    """
+    start = time.time()
+    write_trie(Trie.from_iterable(words, presorted=False), filename)
+    return time.time() - start
+
+
+def build(layout, words, filename=None):
+    """Returns: trie of the given layout containing words.
+
+    For MappedTrie, filename is the trie file written by write_mapped.
+    """
+    if layout == 'MappedTrie':
+        return open_trie(filename)
+    trie_class = dict(Trie=Trie, CompactTrie=CompactTrie,
+                      RadixTrie=RadixTrie)[layout]
+    trie = trie_class()
+    for word in words:
+        trie.insert(word)
+    return trie
+
+
+def measure(layout, words, filename=None, nqueries=10000, seed=1):
+    """Returns: dict of measurements for layout on words."""
+    rand = random.Random(seed)
+    hits = [rand.choice(words) for i in range(nqueries / 2)]
+    queries = hits + [word[::-1] + 'q' for word in hits]
+    prefixes = [word[:3] for word in hits[:1000]]
+    base_rss = peak_rss_mb()
+
+    start = time.time()
+    trie = build(layout, words, filename)
+    insert_time = time.time() - start
+
+    start = time.time()
+    for word in queries:
+        word in trie
+    lookup_time = time.time() - start
+
+    start = time.time()
+    for prefix in prefixes:
+        list(islice(trie.complete(prefix), 10))
+    prefix_time = time.time() - start
+
+    start = time.time()
+    nwords = len(trie.get_words())
+    traverse_time = time.time() - start
+    assert nwords == len(set(words))
+
+    return dict(
+        layout=layout,
+        nwords=len(words),
+        insert_wps=len(words) / insert_time,
+        lookup_us=lookup_time / len(queries) * 1e6,
+        prefix_us=prefix_time / len(prefixes) * 1e6,
+        traverse_s=traverse_time,
+        base_rss_mb=base_rss,
+        peak_rss_mb=peak_rss_mb(),
+        nodes=trie.node_count(),
+        )
+
+
+def run(layouts, sizes, words, output=None):
+    """Measure all layouts for all sizes, each in a fresh process.
+
+    Returns: the list of result records.
+    """
+    records = []
+    for size in sizes:
+        sample = words if size < 0 else words[:size]
+        for layout in layouts:
+            if layout == 'MappedTrie':
+                fd, filename = tempfile.mkstemp(suffix='.trie')
+                os.close(fd)
+                write_time = _in_new_process(write_mapped, sample, filename)
+                record = _in_new_process(measure, layout, sample, filename)
+                record['insert_wps'] = len(sample) / write_time
+                os.remove(filename)
+            else:
+                record = _in_new_process(measure, layout, sample)
+            record.update(
+                time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                python=platform.python_version(),
+                )
+            line = json.dumps(record, sort_keys=True)
+            print line
+            if output:
+                with open(output, 'a') as ofile:
+                    ofile.write(line + '\n')
+            records.append(record)
+    return records
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-w', '--words', default=None,
+                        help='dictionary file, one word per line. '
+                        'By default, words are generated.')
+    parser.add_argument('-s', '--sizes', default='1000,10000,100000',
+                        help='comma-separated dictionary sizes, '
+                        '-1 for the whole dictionary')
+    parser.add_argument('-l', '--layouts', default=','.join(LAYOUTS),
+                        help='comma-separated trie layouts')
+    parser.add_argument('-o', '--output', default=None,
+                        help='file to which the JSON records are appended')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    if args.words:
+        words = list(read_words(filename=args.words))
+    elif min(sizes) < 0:
+        parser.error('the whole dictionary requires a dictionary file')
+    else:
+        words = generate_words(max(sizes))
+    # shuffled, so that a sample of the dictionary covers all letters
+    random.Random(0).shuffle(words)
+    run(args.layouts.split(','), sizes, words, args.output)
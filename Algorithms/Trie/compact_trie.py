@@ -0,0 +1,322 @@
+"""A compact, array-backed Trie.
+
+The Trie class in trie.py allocates a python object and a dict for each
+character node, which costs ~500 MB for a full dictionary.
+
+Here, all nodes live in a few flat arrays, and a node is just an index
+in these arrays:
+
+  label[i]    code of the character leading to node i
+  child[i]    index of the first child of node i, or -1
+  sibling[i]  index of the next sibling of node i, or -1
+  length[i]   number of valid keys in the sub-trie rooted at i
+  valid[i]    1 if node i corresponds to a valid key
+
+This is the left-child right-sibling representation of the tree.
+The siblings are kept sorted by label, so that traversals come out in
+lexicographical order without sorting, and so that a lookup can stop
+as soon as it goes past the requested character.
+
+A node costs 17 bytes, instead of several hundred bytes for Trie.
+Moreover, when the words are inserted in sorted order, the nodes of a
+branch are contiguous in memory, which improves locality of reference.
+"""
+
+import unittest
+from array import array
+from itertools import islice
+
+from trie import build_test_trie
+
+
+def _char(code):
+    '''Returns: character corresponding to a label code.'''
+    return chr(code) if code < 256 else unichr(code)
+
+
+class _TrieArrays(object):
+    """Storage shared by a CompactTrie and all its sub-tries."""
+
+    def __init__(self):
+        self.label = array('I')
+        self.child = array('i')
+        self.sibling = array('i')
+        self.length = array('I')
+        self.valid = array('B')
+        self.new_node(0)
+
+    def new_node(self, code):
+        """Returns: index of a new node reached with character code."""
+        self.label.append(code)
+        self.child.append(-1)
+        self.sibling.append(-1)
+        self.length.append(0)
+        self.valid.append(0)
+        return len(self.label) - 1
+
+    def find_child(self, node, code, create=False):
+        """Returns: index of the child of node with label code.
+
+        If there is no such child, it is created if create is True,
+        and -1 is returned otherwise.
+        """
+        label = self.label
+        sibling = self.sibling
+        previous = -1
+        current = self.child[node]
+        while current != -1 and label[current] < code:
+            previous = current
+            current = sibling[current]
+        if current != -1 and label[current] == code:
+            return current
+        if not create:
+            return -1
+        new = self.new_node(code)
+        # linking the new node at the right place to keep siblings sorted
+        sibling[new] = current
+        if previous == -1:
+            self.child[node] = new
+        else:
+            sibling[previous] = new
+        return new
+
+    def __len__(self):
+        """Number of nodes."""
+        return len(self.label)
+
+
+class CompactTrie(object):
+    """Trie node, with the same interface as trie.Trie.
+
+    A CompactTrie is a view on a node of the shared arrays.
+    """
+
+    def __init__(self, _arrays=None, _node=0):
+        if _arrays is None:
+            _arrays = _TrieArrays()
+        self._arrays = _arrays
+        self._node = _node
+
+    def insert(self, key, debug=False):
+        """Insert key in the trie.
+
+        Returns: the number of new words, 0 if key was already there.
+        """
+        arrays = self._arrays
+        node = self._node
+        path = [node]
+        for char in key:
+            node = arrays.find_child(node, ord(char), create=True)
+            path.append(node)
+        if debug: print 'key', key, 'path', path
+        if arrays.valid[node]:
+            return 0
+        arrays.valid[node] = 1
+        length = arrays.length
+        for node in path:
+            length[node] += 1
+        return 1
+
+    def _find(self, key):
+        """Returns: index of the node corresponding to key, or -1."""
+        arrays = self._arrays
+        node = self._node
+        for char in key:
+            node = arrays.find_child(node, ord(char))
+            if node == -1:
+                break
+        return node
+
+    def is_valid(self):
+        """Returns: True if this Trie node corresponds to a valid key."""
+        return bool(self._arrays.valid[self._node])
+
+    def subtrie(self, key):
+        """Returns: sub-trie corresponding to key, possibly None
+        """
+        node = self._find(key)
+        if node == -1:
+            return None
+        return CompactTrie(self._arrays, node)
+
+    def _iterwords(self, word):
+        """Yields: the valid words of the trie, prefixed by word,
+        in lexicographical order."""
+        arrays = self._arrays
+        label = arrays.label
+        child = arrays.child
+        sibling = arrays.sibling
+        valid = arrays.valid
+        if valid[self._node]:
+            yield word
+        # stack of (node, word up to this node), the first sibling on top
+        todo = []
+        first = child[self._node]
+        if first != -1:
+            todo.append((first, word))
+        while todo:
+            node, prefix = todo.pop()
+            if sibling[node] != -1:
+                todo.append((sibling[node], prefix))
+            word = prefix + _char(label[node])
+            if valid[node]:
+                yield word
+            if child[node] != -1:
+                todo.append((child[node], word))
+
+    def traverse(self, results, word=""):
+        '''Fills results with the valid words in the trie,
+        in lexicographical order.
+        '''
+        results.extend(self._iterwords(word))
+
+    def complete(self, prefix="", limit=None):
+        """Returns: iterator on the valid words starting with prefix,
+        in lexicographical order, limit words at most."""
+        sub = self.subtrie(prefix)
+        if sub is None:
+            return iter([])
+        return islice(sub._iterwords(prefix), limit)
+
+    def iteritems(self):
+        """Yields (character, sub-trie) for each child, in sorted order."""
+        arrays = self._arrays
+        node = arrays.child[self._node]
+        while node != -1:
+            yield _char(arrays.label[node]), CompactTrie(arrays, node)
+            node = arrays.sibling[node]
+
+    def __getitem__(self, key):
+        """Returns child corresponding to key."""
+        node = self._arrays.find_child(self._node, ord(key))
+        if node == -1:
+            raise KeyError(key)
+        return CompactTrie(self._arrays, node)
+
+    def __contains__(self, key):
+        """Returns: True if key is a valid word in the trie."""
+        node = self._find(key)
+        return node != -1 and bool(self._arrays.valid[node])
+
+    def __len__(self):
+        """Number of valid keys in the trie."""
+        return self._arrays.length[self._node]
+
+    def __eq__(self, other):
+        return (isinstance(other, CompactTrie) and
+                self._arrays is other._arrays and
+                self._node == other._node)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "CompactTrie {node},{length} -> {children}".format(
+            node=self._node,
+            length=len(self),
+            children=",".join(char for char, child in self.iteritems())
+            )
+
+    def get_words(self):
+        '''Returns: all words in the trie.'''
+        words = []
+        self.traverse(words)
+        return words
+
+    def node_count(self):
+        '''Returns: total number of nodes in the underlying arrays.'''
+        return len(self._arrays)
+
+    def nbytes(self):
+        '''Returns: memory used by the underlying arrays, in bytes.'''
+        arrays = self._arrays
+        return sum(arr.itemsize * len(arr) for arr in
+                   [arrays.label, arrays.child, arrays.sibling,
+                    arrays.length, arrays.valid])
+
+
+class CompactTrieCase(unittest.TestCase):
+
+    words = ["a", "b", "abron", "badminton", "bad", "bid"]
+
+    def build(self):
+        trie = CompactTrie()
+        for word in self.words:
+            trie.insert(word)
+        return trie
+
+    def test_insert_word(self):
+        trie = CompactTrie()
+        self.assertEqual(trie.insert("colin"), 1)
+        self.assertIn("colin", trie)
+        self.assertNotIn("c", trie)
+        self.assertIn("c", dict(trie.iteritems()))
+        self.assertIn("o", dict(trie["c"].iteritems()))
+        self.assertEqual(trie.node_count(), 6)
+
+    def test_insert_twice(self):
+        trie = CompactTrie()
+        trie.insert("colin")
+        self.assertEqual(trie.insert("colin"), 0)
+        self.assertEqual(len(trie), 1)
+
+    def test_subtrie(self):
+        trie = CompactTrie()
+        self.assertEqual(trie.subtrie(""), trie)
+        trie.insert("colin")
+        colin = trie.subtrie("colin")
+        self.assertNotEqual(colin, None)
+        self.assertTrue(colin.is_valid())
+        coli = trie.subtrie("coli")
+        self.assertNotEqual(coli, None)
+        self.assertFalse(coli.is_valid())
+        self.assertEqual(trie.subtrie("zobi"), None)
+
+    def test_length(self):
+        trie = self.build()
+        self.assertEqual(len(trie), 6)
+        self.assertEqual(len(trie.subtrie("b")), 4)
+        self.assertEqual(len(trie.subtrie("bad")), 2)
+
+    def test_contains(self):
+        trie = self.build()
+        self.assertIn('a', trie)
+        self.assertIn('badminton', trie)
+        self.assertNotIn('z', trie)
+        self.assertNotIn('badm', trie)
+
+    def test_get_words(self):
+        trie = self.build()
+        self.assertEqual(trie.get_words(), build_test_trie().get_words())
+        self.assertEqual(trie.subtrie("ba").get_words(), ["d", "dminton"])
+
+    def test_complete(self):
+        trie = self.build()
+        self.assertEqual(list(trie.complete("ba")), ["bad", "badminton"])
+        self.assertEqual(list(trie.complete("b", limit=2)), ["b", "bad"])
+        self.assertEqual(list(trie.complete("z")), [])
+
+    def test_repr(self):
+        trie = self.build()
+        self.assertRegexpMatches(repr(trie), r"^CompactTrie\s\S+\s->\s.*$")
+
+
+if __name__ == "__main__":
+
+    import sys
+    import time
+    import resource
+    from trie import build_dict_trie
+
+    if len(sys.argv) > 1:
+        # python compact_trie.py /usr/share/dict/words
+        start = time.time()
+        dtrie = build_dict_trie(filename=sys.argv[1], trie_class=CompactTrie)
+        print 'words       ', len(dtrie)
+        print 'nodes       ', dtrie.node_count()
+        print 'arrays (MB) ', dtrie.nbytes() / 1e6
+        print 'max RSS (MB)', resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss / 1e3
+        print 'time (s)    ', time.time() - start
+    else:
+        unittest.main()
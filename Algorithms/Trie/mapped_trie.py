@@ -0,0 +1,450 @@
+"""Binary file format for tries, read through mmap.
+
+Building a trie from a full dictionary takes seconds and hundreds of MB.
+Instead, the trie can be written once to a file with write_trie,
+and opened with open_trie. The file is memory-mapped and the lookups
+are done directly on the mapped buffer: opening is instantaneous,
+the pages are loaded by the OS on demand, and they are shared by all
+processes reading the same file.
+
+File layout, little endian:
+
+  header   magic 'TRIE', version, number of nodes, number of edges
+  nodes    one record per node: first edge, number of edges,
+           number of valid keys in the sub-trie, valid flag
+  labels   one character code per edge
+
+The nodes are numbered in breadth-first order, and the edges of a node
+are sorted by label. With this ordering, edge e leads to node e+1,
+so there is no need to store the edge targets.
+"""
+
+import os
+import mmap
+import hashlib
+import struct
+import tempfile
+import threading
+import unittest
+from array import array
+from collections import deque
+from itertools import islice
+from operator import itemgetter
+
+from trie import Trie, build_test_trie, read_words
+from compact_trie import _char
+
+MAGIC = 'TRIE'
+VERSION = 1
+
+_header = struct.Struct('<4sIII')
+_node = struct.Struct('<IIIB')
+_label = struct.Struct('<I')
+
+
+def write_trie(trie, filename):
+    """Write trie to filename.
+
+    trie can be any trie providing iteritems, is_valid and len,
+    e.g. Trie or CompactTrie. The nodes are streamed to the file,
+    only the edge labels are kept in memory.
+    """
+    labels = array('I')
+    nnodes = 0
+    with open(filename, 'wb') as ofile:
+        ofile.write(_header.pack(MAGIC, VERSION, 0, 0))
+        todo = deque([trie])
+        while todo:
+            node = todo.popleft()
+            children = sorted(node.iteritems(), key=itemgetter(0))
+            ofile.write(_node.pack(len(labels), len(children),
+                                   len(node), node.is_valid()))
+            nnodes += 1
+            for char, child in children:
+                labels.append(ord(char))
+                todo.append(child)
+        labels.tofile(ofile)
+        ofile.seek(0)
+        ofile.write(_header.pack(MAGIC, VERSION, nnodes, len(labels)))
+
+
+def open_trie(filename):
+    """Returns: the root MappedTrie of a file written by write_trie."""
+    return MappedTrie(_MappedFile(filename))
+
+
+def dict_trie_filename(filename):
+    """Returns: default path of the trie file of a dictionary, in the
+    temporary directory. The name contains a hash of the real path of the
+    dictionary, so that two dictionaries with the same name in different
+    directories get different trie files."""
+    path = os.path.realpath(filename)
+    return os.path.join(tempfile.gettempdir(), '{0}.{1}.trie'.format(
+        os.path.basename(path), hashlib.md5(path).hexdigest()[:16]))
+
+
+def load_dict_trie(filename='/usr/share/dict/words', trie_filename=None):
+    """Returns: a MappedTrie containing the words from a dictionary.
+
+    The trie file is written the first time, and again when the
+    dictionary is more recent than the trie file.
+
+    Args:
+      filename       path to a file containing one word per line
+      trie_filename  path to the trie file. By default, in the temporary
+                     directory, see dict_trie_filename.
+    """
+    if trie_filename is None:
+        trie_filename = dict_trie_filename(filename)
+    if (not os.path.isfile(trie_filename) or
+            os.path.getmtime(trie_filename) < os.path.getmtime(filename)):
+        trie = Trie.from_iterable(read_words(filename=filename),
+                                  presorted=False)
+        # writing to a new temporary file and renaming it, so that another
+        # process never maps a partially written file
+        fd, tmp_filename = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(trie_filename)))
+        os.close(fd)
+        try:
+            write_trie(trie, tmp_filename)
+            os.rename(tmp_filename, trie_filename)
+        except:
+            os.remove(tmp_filename)
+            raise
+    return open_trie(trie_filename)
+
+
+_dict_tries = dict()    # (path, mtime) -> trie, see get_dict_trie
+_dict_tries_lock = threading.Lock()
+
+
+def get_dict_trie(filename='/usr/share/dict/words'):
+    """Returns: the MappedTrie of a dictionary, loaded once per process.
+
+    The trie is loaded with load_dict_trie on the first call only.
+    It is cached by path and modification time of the dictionary,
+    so that it is loaded again if the dictionary changes. The previous
+    trie is only removed from the cache, not closed, as other callers may
+    still use it: it is unmapped when it is garbage collected.
+    Processes forked after the first call, like the workers of a
+    multiprocessing pool, inherit the cached trie. As each call checks
+    the dictionary, the trie should be given to the code using it
+    many times, e.g. by a pool initializer.
+    """
+    path = os.path.realpath(filename)
+    key = (path, os.path.getmtime(path))
+    with _dict_tries_lock:
+        trie = _dict_tries.get(key)
+        if trie is None:
+            for old_key in [old_key for old_key in _dict_tries
+                            if old_key[0] == path]:
+                del _dict_tries[old_key]
+            trie = load_dict_trie(path)
+            _dict_tries[key] = trie
+    return trie
+
+
+class _MappedFile(object):
+    """Mapped trie file, shared by a MappedTrie and all its sub-tries."""
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as ifile:
+            self.buffer = mmap.mmap(ifile.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        if len(self.buffer) < _header.size:
+            magic, version = None, None
+        else:
+            magic, version, self.nnodes, self.nedges = \
+                _header.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self.buffer.close()
+            raise ValueError('{0} is not a trie file, version {1}'.format(
+                filename, VERSION))
+        self.labels_offset = _header.size + self.nnodes * _node.size
+        if len(self.buffer) < self.labels_offset + self.nedges * _label.size:
+            self.buffer.close()
+            raise ValueError('{0} is truncated'.format(filename))
+
+    def node(self, node):
+        """Returns: first edge, number of edges, length, valid flag."""
+        return _node.unpack_from(self.buffer, _header.size + node * _node.size)
+
+    def label(self, edge):
+        """Returns: character code of edge."""
+        return _label.unpack_from(self.buffer,
+                                  self.labels_offset + edge * _label.size)[0]
+
+    def find_child(self, node, code):
+        """Returns: index of the child of node with label code, or -1."""
+        first, nedges, length, valid = self.node(node)
+        # binary search among the sorted edges of the node
+        smin = first
+        smax = first + nedges
+        while smax > smin:
+            midpoint = smin + (smax - smin) / 2
+            label = self.label(midpoint)
+            if code > label:
+                smin = midpoint + 1
+            elif code < label:
+                smax = midpoint
+            else:
+                return midpoint + 1
+        return -1
+
+    def close(self):
+        self.buffer.close()
+
+
+class MappedTrie(object):
+    """Read-only trie node, on a mapped trie file.
+
+    Same interface as trie.Trie, except for insert.
+    """
+
+    def __init__(self, _file, _node=0):
+        self._file = _file
+        self._node = _node
+
+    def _find(self, key):
+        """Returns: index of the node corresponding to key, or -1."""
+        node = self._node
+        for char in key:
+            node = self._file.find_child(node, ord(char))
+            if node == -1:
+                break
+        return node
+
+    def is_valid(self):
+        """Returns: True if this Trie node corresponds to a valid key."""
+        return bool(self._file.node(self._node)[3])
+
+    def subtrie(self, key):
+        """Returns: sub-trie corresponding to key, possibly None
+        """
+        node = self._find(key)
+        if node == -1:
+            return None
+        return MappedTrie(self._file, node)
+
+    def iteritems(self):
+        """Yields (character, sub-trie) for each child, in sorted order."""
+        first, nedges, length, valid = self._file.node(self._node)
+        for edge in range(first, first + nedges):
+            yield (_char(self._file.label(edge)),
+                   MappedTrie(self._file, edge + 1))
+
+    def _iterwords(self, word):
+        """Yields: the valid words of the trie, prefixed by word,
+        in lexicographical order."""
+        todo = [(word, self)]
+        while todo:
+            word, node = todo.pop()
+            if node.is_valid():
+                yield word
+            children = list(node.iteritems())
+            for char, child in reversed(children):
+                todo.append((word + char, child))
+
+    def traverse(self, results, word=""):
+        '''Fills results with the valid words in the trie,
+        in lexicographical order.
+        '''
+        results.extend(self._iterwords(word))
+
+    def complete(self, prefix="", limit=None):
+        """Returns: iterator on the valid words starting with prefix,
+        in lexicographical order, limit words at most."""
+        sub = self.subtrie(prefix)
+        if sub is None:
+            return iter([])
+        return islice(sub._iterwords(prefix), limit)
+
+    def get_words(self):
+        '''Returns: all words in the trie.'''
+        words = []
+        self.traverse(words)
+        return words
+
+    def __getitem__(self, key):
+        """Returns child corresponding to key."""
+        node = self._file.find_child(self._node, ord(key))
+        if node == -1:
+            raise KeyError(key)
+        return MappedTrie(self._file, node)
+
+    def __contains__(self, key):
+        """Returns: True if key is a valid word in the trie."""
+        node = self._find(key)
+        return node != -1 and bool(self._file.node(node)[3])
+
+    def __len__(self):
+        """Number of valid keys in the trie."""
+        return self._file.node(self._node)[2]
+
+    def __eq__(self, other):
+        return (isinstance(other, MappedTrie) and
+                self._file is other._file and
+                self._node == other._node)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "MappedTrie {node},{length} -> {children}".format(
+            node=self._node,
+            length=len(self),
+            children=",".join(char for char, child in self.iteritems())
+            )
+
+    def node_count(self):
+        '''Returns: total number of nodes in the file.'''
+        return self._file.nnodes
+
+    def close(self):
+        '''Unmap the file. The trie and its sub-tries can't be used anymore.'''
+        self._file.close()
+
+
+class MappedTrieCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.trie')
+        os.close(fd)
+        self.reference = build_test_trie()
+        write_trie(self.reference, self.filename)
+        self.trie = open_trie(self.filename)
+
+    def tearDown(self):
+        self.trie.close()
+        os.remove(self.filename)
+
+    def test_header(self):
+        self.assertEqual(self.trie.node_count(), 17)
+        self.assertEqual(len(self.trie), 6)
+
+    def test_subtrie(self):
+        self.assertEqual(self.trie.subtrie(""), self.trie)
+        bad = self.trie.subtrie("bad")
+        self.assertTrue(bad.is_valid())
+        self.assertEqual(len(bad), 2)
+        self.assertFalse(self.trie.subtrie("ba").is_valid())
+        self.assertEqual(self.trie.subtrie("zobi"), None)
+        self.assertEqual(self.trie.subtrie("badmintonz"), None)
+
+    def test_contains(self):
+        for word in self.reference.get_words():
+            self.assertIn(word, self.trie)
+        self.assertNotIn('ba', self.trie)
+        self.assertNotIn('z', self.trie)
+
+    def test_get_words(self):
+        self.assertEqual(self.trie.get_words(), self.reference.get_words())
+        self.assertEqual(self.trie.subtrie("ba").get_words(),
+                         ["d", "dminton"])
+
+    def test_complete(self):
+        self.assertEqual(list(self.trie.complete("ba")), ["bad", "badminton"])
+        self.assertEqual(list(self.trie.complete("b", limit=1)), ["b"])
+        self.assertEqual(list(self.trie.complete("z")), [])
+
+    def test_bad_file(self):
+        with open(self.filename, 'wb') as ofile:
+            ofile.write('not a trie file')
+        self.assertRaises(ValueError, open_trie, self.filename)
+        # truncated after the header
+        write_trie(self.reference, self.filename)
+        with open(self.filename, 'r+b') as ofile:
+            ofile.truncate(_header.size + _node.size)
+        self.assertRaises(ValueError, open_trie, self.filename)
+
+    def test_load_dict_trie(self):
+        fd, dict_filename = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as ofile:
+            ofile.write('\n'.join(['Peanut', 'butter', 'pea', 'nut']))
+        try:
+            trie = load_dict_trie(dict_filename, self.filename)
+            self.assertEqual(trie.get_words(),
+                             ['butter', 'nut', 'pea', 'peanut'])
+            trie.close()
+        finally:
+            os.remove(dict_filename)
+
+    def test_load_dict_trie_error(self):
+        # the trie file cannot be replaced: no temporary file is left
+        tmpdir = tempfile.mkdtemp()
+        dict_filename = os.path.join(tmpdir, 'words')
+        trie_filename = os.path.join(tmpdir, 'words.trie')
+        with open(dict_filename, 'w') as ofile:
+            ofile.write('pea')
+        os.mkdir(trie_filename)
+        try:
+            self.assertRaises(OSError, load_dict_trie, dict_filename,
+                              trie_filename)
+            self.assertEqual(sorted(os.listdir(tmpdir)),
+                             ['words', 'words.trie'])
+        finally:
+            os.rmdir(trie_filename)
+            os.remove(dict_filename)
+            os.rmdir(tmpdir)
+
+    def test_same_name(self):
+        # dictionaries with the same name in different directories
+        dirs = [tempfile.mkdtemp() for i in range(2)]
+        dict_filenames = [os.path.join(d, 'words') for d in dirs]
+        try:
+            for dict_filename, word in zip(dict_filenames, ['pea', 'nut']):
+                with open(dict_filename, 'w') as ofile:
+                    ofile.write(word)
+            for dict_filename, word in zip(dict_filenames, ['pea', 'nut']):
+                trie = load_dict_trie(dict_filename)
+                self.assertEqual(trie.get_words(), [word])
+                trie.close()
+        finally:
+            for dict_filename in dict_filenames:
+                trie_filename = dict_trie_filename(dict_filename)
+                if os.path.exists(trie_filename):
+                    os.remove(trie_filename)
+                os.remove(dict_filename)
+            for d in dirs:
+                os.rmdir(d)
+
+    def test_get_dict_trie(self):
+        fd, dict_filename = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as ofile:
+            ofile.write('\n'.join(['pea', 'nut']))
+        trie_filename = dict_trie_filename(dict_filename)
+        try:
+            trie = get_dict_trie(dict_filename)
+            self.assertIs(get_dict_trie(dict_filename), trie)
+            # the dictionary changes
+            with open(dict_filename, 'a') as ofile:
+                ofile.write('\npeanut')
+            mtime = os.path.getmtime(trie_filename) + 1
+            os.utime(dict_filename, (mtime, mtime))
+            new_trie = get_dict_trie(dict_filename)
+            self.assertIsNot(new_trie, trie)
+            self.assertIn('peanut', new_trie)
+            self.assertEqual(len(_dict_tries), 1)
+            # the previous trie can still be used
+            self.assertEqual(len(trie), 2)
+            self.assertNotIn('peanut', trie)
+        finally:
+            _dict_tries.clear()
+            os.remove(dict_filename)
+            os.remove(trie_filename)
+
+
+if __name__ == "__main__":
+
+    import sys
+    import time
+
+    if len(sys.argv) > 1:
+        # python mapped_trie.py /usr/share/dict/words
+        start = time.time()
+        dtrie = load_dict_trie(sys.argv[1])
+        print 'load (s) ', time.time() - start
+        print 'words    ', len(dtrie)
+        print 'nodes    ', dtrie.node_count()
+    else:
+        unittest.main()
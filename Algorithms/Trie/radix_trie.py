@@ -0,0 +1,313 @@
+"""Radix tree: a path-compressed Trie.
+http://en.wikipedia.org/wiki/Radix_tree
+
+In a dictionary trie, most nodes have a single child: after a few
+letters, there is usually only one way to finish the word.
+In the radix tree, each chain of single-child nodes is collapsed
+into a single node, and the edge leading to a node is labelled by
+a string instead of a character.
+
+For example, with the words "bad", "badminton" and "bid":
+
+  Trie:   b - a - d* - m - i - n - t - o - n*
+           \\
+            i - d*
+
+  Radix:  b - ad* - minton*
+           \\
+            id*
+"""
+
+import unittest
+from itertools import islice
+
+
+class RadixTrie(object):
+    """Radix tree node.
+
+    The label is the string on the edge leading to the node.
+    The children are indexed by the first character of their label.
+    """
+
+    __slots__ = ['_label', '_children', '_length', '_valid']
+
+    def __init__(self, label=""):
+        self._label = label
+        self._children = dict()
+        self._length = 0
+        self._valid = False
+
+    def _split(self, index):
+        """Split the label of this node at index.
+
+        Returns: the new node holding the beginning of the label,
+        which has this node as only child.
+        """
+        head = RadixTrie(self._label[:index])
+        head._length = self._length
+        self._label = self._label[index:]
+        head._children[self._label[0]] = self
+        return head
+
+    def _merge_child(self):
+        """Absorb the only child of this node."""
+        child, = self._children.values()
+        self._label += child._label
+        self._children = child._children
+        self._valid = child._valid
+
+    def insert(self, key):
+        """Insert key in the trie.
+
+        Returns: the number of new words, 0 if key was already there.
+        """
+        node = self
+        path = [node]
+        pos = 0
+        while pos < len(key):
+            child = node._children.get(key[pos])
+            if child is None:
+                child = RadixTrie(key[pos:])
+                node._children[key[pos]] = child
+                pos = len(key)
+            else:
+                label = child._label
+                common = 1
+                ncommon = min(len(label), len(key) - pos)
+                while common < ncommon and label[common] == key[pos + common]:
+                    common += 1
+                if common < len(label):
+                    child = child._split(common)
+                    node._children[key[pos]] = child
+                pos += common
+            node = child
+            path.append(node)
+        if node._valid:
+            return 0
+        node._valid = True
+        for node in path:
+            node._length += 1
+        return 1
+
+    def _find_path(self, key):
+        """Returns: list of the nodes from this one to the node
+        corresponding exactly to key, or None.
+        """
+        node = self
+        path = [node]
+        pos = 0
+        while pos < len(key):
+            node = node._children.get(key[pos])
+            if node is None or not key.startswith(node._label, pos):
+                return None
+            pos += len(node._label)
+            path.append(node)
+        return path
+
+    def remove(self, key):
+        """Remove key from the trie.
+
+        The nodes left with a single child and no valid key are merged
+        back with their child.
+
+        Returns: the number of removed words, 0 if key was not there.
+        """
+        path = self._find_path(key)
+        if path is None or not path[-1]._valid:
+            return 0
+        node = path[-1]
+        node._valid = False
+        for ancestor in path:
+            ancestor._length -= 1
+        if node is self:
+            return 1
+        parent = path[-2]
+        if not node._children:
+            del parent._children[node._label[0]]
+            node = parent
+        if node is not self and not node._valid and len(node._children) == 1:
+            node._merge_child()
+        return 1
+
+    def is_valid(self):
+        """Returns: True if this node corresponds to a valid key."""
+        return self._valid
+
+    def complete(self, prefix="", limit=None):
+        """Returns: iterator on the valid words starting with prefix,
+        in lexicographical order, limit words at most.
+        """
+        return islice(self._iterwords(prefix), limit)
+
+    def _iterwords(self, prefix):
+        """Yields: the valid words starting with prefix,
+        in lexicographical order.
+        """
+        node = self
+        pos = 0
+        while pos < len(prefix):
+            node = node._children.get(prefix[pos])
+            if node is None:
+                return
+            label = node._label
+            # the prefix may end in the middle of the label
+            end = min(len(prefix), pos + len(label))
+            if prefix[pos:end] != label[:end - pos]:
+                return
+            pos += len(label)
+        todo = [(prefix[:pos - len(node._label)] + node._label
+                 if node is not self else prefix, node)]
+        while todo:
+            word, node = todo.pop()
+            if node._valid:
+                yield word
+            children = node._children
+            for key in sorted(children, reverse=True):
+                child = children[key]
+                todo.append((word + child._label, child))
+
+    def get_words(self):
+        '''Returns: all words in the trie.'''
+        return list(self.complete())
+
+    def node_count(self):
+        '''Returns: number of nodes in the trie.'''
+        count = 0
+        todo = [self]
+        while todo:
+            node = todo.pop()
+            count += 1
+            todo.extend(node._children.itervalues())
+        return count
+
+    def __contains__(self, key):
+        """Returns: True if key is a valid word in the trie."""
+        path = self._find_path(key)
+        return path is not None and path[-1]._valid
+
+    def __len__(self):
+        """Number of valid keys in the trie."""
+        return self._length
+
+    def __repr__(self):
+        return "RadixTrie {label},{length} -> {children}".format(
+            label=self._label,
+            length=self._length,
+            children=",".join(child._label for child in
+                              self._children.itervalues())
+            )
+
+
+class RadixTrieCase(unittest.TestCase):
+
+    words = ["a", "b", "abron", "badminton", "bad", "bid"]
+
+    def build(self):
+        trie = RadixTrie()
+        for word in self.words:
+            trie.insert(word)
+        return trie
+
+    def test_insert(self):
+        trie = RadixTrie()
+        self.assertEqual(trie.insert("badminton"), 1)
+        self.assertEqual(trie.insert("badminton"), 0)
+        self.assertEqual(trie.node_count(), 2)
+        trie.insert("bad")
+        self.assertEqual(trie.node_count(), 3)
+        self.assertEqual(trie._children["b"]._label, "bad")
+        trie.insert("bid")
+        self.assertEqual(trie.node_count(), 5)
+        self.assertEqual(len(trie), 3)
+
+    def test_contains(self):
+        trie = self.build()
+        for word in self.words:
+            self.assertIn(word, trie)
+        self.assertNotIn("ba", trie)
+        self.assertNotIn("badm", trie)
+        self.assertNotIn("z", trie)
+        self.assertNotIn("", trie)
+
+    def test_complete(self):
+        trie = self.build()
+        self.assertEqual(trie.get_words(), sorted(self.words))
+        self.assertEqual(list(trie.complete("b")),
+                         ["b", "bad", "badminton", "bid"])
+        self.assertEqual(list(trie.complete("badm")), ["badminton"])
+        self.assertEqual(list(trie.complete("bada")), [])
+        self.assertEqual(list(trie.complete("z")), [])
+        self.assertEqual(list(trie.complete("b", limit=2)), ["b", "bad"])
+
+    def test_remove(self):
+        trie = self.build()
+        self.assertEqual(trie.remove("ba"), 0)
+        self.assertEqual(trie.remove("bad"), 1)
+        self.assertEqual(trie.remove("bad"), 0)
+        self.assertNotIn("bad", trie)
+        self.assertIn("badminton", trie)
+        self.assertEqual(len(trie), 5)
+        # "ad" and "minton" merged back
+        self.assertEqual(trie._children["b"]._children["a"]._label,
+                         "adminton")
+
+    def test_remove_leaf(self):
+        trie = self.build()
+        trie.remove("bid")
+        # "b" has a single child left, but it is a valid word
+        self.assertEqual(trie._children["b"]._label, "b")
+        trie.remove("b")
+        self.assertEqual(trie._children["b"]._label, "bad")
+        self.assertEqual(trie.get_words(), ["a", "abron", "bad", "badminton"])
+
+    def test_remove_all(self):
+        trie = self.build()
+        for word in self.words:
+            trie.remove(word)
+        self.assertEqual(len(trie), 0)
+        self.assertEqual(trie.node_count(), 1)
+
+
+def _measure(trie_class, words):
+    """Returns: dict of performance figures for trie_class on words.
+
+    Run in a separate process, to get a clean peak memory.
+    """
+    import time
+    import resource
+    stats = dict()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    trie = trie_class()
+    for word in words:
+        trie.insert(word)
+    stats['insert (s)'] = time.time() - start
+    stats['memory (MB)'] = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                            - rss_before) / 1e3
+    start = time.time()
+    for word in words:
+        word in trie
+    stats['lookup (us)'] = (time.time() - start) / len(words) * 1e6
+    stats['nodes'] = trie.node_count()
+    return stats
+
+
+if __name__ == "__main__":
+
+    import sys
+    from multiprocessing import Pool
+    from trie import Trie, read_words
+
+    if len(sys.argv) > 1:
+        # python radix_trie.py /usr/share/dict/words
+        words = list(read_words(filename=sys.argv[1]))
+        print 'words', len(words)
+        for trie_class in [Trie, RadixTrie]:
+            pool = Pool(1)
+            stats = pool.apply(_measure, (trie_class, words))
+            pool.close()
+            print trie_class.__name__
+            for key, value in sorted(stats.iteritems()):
+                print '  {key:12} {value:.6g}'.format(key=key, value=value)
+    else:
+        unittest.main()
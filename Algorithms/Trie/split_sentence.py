@@ -1,6 +1,12 @@
-from trie import Trie, build_dict_trie
+import os
+import math
+import unittest
+from multiprocessing import Pool
 
-dtrie = build_dict_trie()
+from trie import Trie
+from mapped_trie import get_dict_trie
+
+# the dictionary trie is only loaded when needed, with get_dict_trie()
 
 ## dtrie = Trie()
 ## dtrie.insert('pea')
@@ -12,11 +18,12 @@ dtrie = build_dict_trie()
 #TODO: use word frequency, and assign a probability to each combination.
 # give highest probability.
 #TODO: conjugation
-#TODO: special words: a, I, you, the, end. high probability separators. 
+#TODO: special words: a, I, you, the, end. high probability separators.
 
 def split_sentence(words, sentence="peanutbutter"):
     if len(sentence)<2:
         return
+    dtrie = get_dict_trie()
     word=''
     imax = None
     for i, letter in enumerate(sentence):
@@ -34,7 +41,197 @@ def split_sentence(words, sentence="peanutbutter"):
     words.append( sentence[:imax])
     split_sentence(words, sentence[imax:])
 
-def split(sentence):
+
+def load_word_frequencies(
+        filename=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'wordlist.txt')):
+    '''Returns: dict word -> frequency.
+
+    filename is a frequency list from http://www.wordfrequency.info,
+    with tab-separated columns: rank, word, part of speech, frequency,
+    dispersion. The frequencies of a word used as several parts of speech
+    are added. Lines without a frequency are skipped.
+    '''
+    frequencies = dict()
+    with open(filename) as ifile:
+        for line in ifile:
+            fields = line.split('\t')
+            if len(fields) != 5 or not fields[3].strip().isdigit():
+                continue
+            word = fields[1].strip().lower()
+            frequencies[word] = frequencies.get(word, 0) + int(fields[3])
+    return frequencies
+
+
+def log_total_frequency(frequencies):
+    '''Returns: log of the sum of the frequencies, plus one, from which
+    segment computes the cost of the words.'''
+    return math.log(sum(frequencies.itervalues()) + 1)
+
+
+_frequencies = None
+_log_total = None
+
+
+def get_word_frequencies():
+    '''Returns: the word frequencies from wordlist.txt, loaded once.'''
+    global _frequencies, _log_total
+    if _frequencies is None:
+        _frequencies = load_word_frequencies()
+        _log_total = log_total_frequency(_frequencies)
+    return _frequencies
+
+
+def get_log_total_frequency():
+    '''Returns: log_total_frequency of get_word_frequencies(),
+    computed once.'''
+    get_word_frequencies()
+    return _log_total
+
+
+def segment(sentence, trie=None, frequencies=None, log_total=None):
+    '''Returns: the list of words giving the best split of sentence.
+
+    Dynamic programming: best[i] is the cost of the best split of
+    sentence[:i]. From each position i, we walk down the trie one letter
+    at a time, and each valid node reached at position j is a candidate
+    word sentence[i:j]. Therefore the cost is O(n * maxlen), where maxlen
+    is the length of the longest word.
+
+    The cost of a word is:
+    - without frequencies, 1: the split with the fewest words wins.
+    - with frequencies, -log(probability of the word), so that the most
+      probable sequence of words wins (Viterbi). Words of the dictionary
+      missing from the frequencies are counted as seen once.
+      log_total is log_total_frequency(frequencies), computed again
+      for each sentence if it is not given.
+    A letter which cannot be the start of a word is kept as a one-letter
+    word, with a cost 10 times higher than the most expensive word.
+    '''
+    if trie is None:
+        trie = get_dict_trie()
+    if frequencies:
+        if log_total is None:
+            log_total = log_total_frequency(frequencies)
+        def word_cost(word):
+            return log_total - math.log(frequencies.get(word, 0) + 1)
+        unknown_cost = 10 * log_total
+    else:
+        word_cost = lambda word: 1
+        unknown_cost = 10
+    nletters = len(sentence)
+    best = [0] + [float('inf')] * nletters
+    start = [0] * (nletters + 1)   # start of the last word
+    for i in range(nletters):
+        cost = best[i]
+        # unknown letter
+        if cost + unknown_cost < best[i+1]:
+            best[i+1] = cost + unknown_cost
+            start[i+1] = i
+        node = trie
+        for j in range(i, nletters):
+            node = node.subtrie(sentence[j])
+            if node is None:
+                break
+            if node.is_valid():
+                word_end_cost = cost + word_cost(sentence[i:j+1])
+                if word_end_cost < best[j+1]:
+                    best[j+1] = word_end_cost
+                    start[j+1] = i
     words = []
-    split_sentence(words, sentence)
+    end = nletters
+    while end > 0:
+        words.append(sentence[start[end]:end])
+        end = start[end]
+    words.reverse()
+    return words
+
+
+# trie, frequencies and log total of a worker process of segment_file
+_worker = None
+
+
+def _init_worker(trie, frequencies, log_total):
+    '''initializer of the worker processes of segment_file. The workers
+    are forked, so that the trie is inherited, not pickled.'''
+    global _worker
+    _worker = trie, frequencies, log_total
+
+
+def _segment_line(line):
+    '''Returns: the segmented line, using the dictionary trie
+    and the word frequencies. Runs in the worker processes of segment_file.
+    '''
+    trie, frequencies, log_total = _worker
+    return segment(line.strip(), trie, frequencies, log_total)
+
+
+def segment_file(filename, processes=None, chunksize=1000):
+    '''Yields: the list of words for each line of filename.
+
+    The lines are segmented in parallel by a pool of processes.
+    The workers are forked from this process, so they share the trie
+    instead of building it again.
+
+    Args:
+      processes  number of processes, defaults to the number of CPUs
+      chunksize  number of lines sent at once to a worker
+    '''
+    # loaded once, before forking the workers
+    pool = Pool(processes, initializer=_init_worker,
+                initargs=(get_dict_trie(), get_word_frequencies(),
+                          get_log_total_frequency()))
+    try:
+        with open(filename) as ifile:
+            for words in pool.imap(_segment_line, ifile, chunksize):
+                yield words
+    finally:
+        pool.terminate()
+
+
+def split(sentence):
+    words = segment(sentence, get_dict_trie(), get_word_frequencies(),
+                    get_log_total_frequency())
     print words
+
+
+class SegmentCase(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = Trie()
+        for word in ['pea', 'nut', 'peanut', 'butter', 'butt', 'but',
+                     'nutter', 'a', 'an', 'tan']:
+            self.trie.insert(word)
+
+    def test_fewest_words(self):
+        self.assertEqual(segment('peanutbutter', self.trie),
+                         ['peanut', 'butter'])
+
+    def test_not_greedy(self):
+        # greedy would take 'peanut', and be stuck with 'ter'
+        self.assertEqual(segment('peanutter', self.trie), ['pea', 'nutter'])
+        self.assertEqual(segment('atan', self.trie), ['a', 'tan'])
+
+    def test_frequencies(self):
+        self.assertEqual(segment('peanut', self.trie, dict(pea=100, nut=100)),
+                         ['pea', 'nut'])
+        self.assertEqual(segment('peanut', self.trie, dict(peanut=100)),
+                         ['peanut'])
+        frequencies = dict(pea=100, nut=100)
+        self.assertEqual(segment('peanut', self.trie, frequencies,
+                                 log_total_frequency(frequencies)),
+                         ['pea', 'nut'])
+
+    def test_unknown_letters(self):
+        self.assertEqual(segment('xpeanutz', self.trie),
+                         ['x', 'peanut', 'z'])
+        self.assertEqual(segment('', self.trie), [])
+
+    def test_long_sentence(self):
+        # no recursion limit
+        sentence = 'peanutbutter' * 1000
+        self.assertEqual(len(segment(sentence, self.trie)), 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
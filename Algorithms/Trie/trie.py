@@ -2,6 +2,8 @@
 http://en.wikipedia.org/wiki/Trie
 """
 
+import gc
+import heapq
 import unittest
 
 class Trie(object):
@@ -13,27 +15,100 @@ class Trie(object):
 #TODO locality of reference
 #TODO number of nodes
 
+    # weight of the key, and maximum weight in the sub-trie, see top_k.
+    # class attributes, so that nodes of an unweighted trie don't pay for them
+    _weight = 0
+    _max_weight = 0
+
     def __init__(self):
         self._children = dict()
         self._length = 0
         self._valid = False
         
-    def insert(self, key, debug=False):
-        """Insert key in the trie."""
+    def insert(self, key, debug=False, weight=None):
+        """Insert key in the trie.
+
+        weight is an optional score for the key, e.g. its frequency.
+        """
         if debug: print 'key', key
+        if weight is not None and weight > self._max_weight:
+            self._max_weight = weight
         if key == "":
             self._valid = True
             self._length += 1
+            if weight is not None:
+                self._weight = weight
             if debug: print 'leaf', self
             return 1
         else:
-            child = self._children.setdefault(key[0], Trie())
+            child = self._children.setdefault(key[0], type(self)())
             remaining = "" if len(key) == 1 else key[1:]
-            n_new_words = child.insert(remaining, debug)
+            n_new_words = child.insert(remaining, debug, weight)
             self._length += n_new_words
             if debug: print 'up', self
             return n_new_words
 
+    @classmethod
+    def from_iterable(cls, words, presorted=True):
+        """Returns: a trie built in a single pass over words.
+
+        Args:
+          words      iterable of words, e.g. a generator reading a file
+          presorted  if False, words are sorted first.
+
+        Since the words come in lexicographical order, a word shares its
+        first nodes with the previous word, and the nodes below this
+        common prefix will never be modified again. These nodes are kept
+        on an explicit stack: no recursion, and no copy of the keys.
+        The number of valid keys of a node is added to its parent once,
+        when the node is popped from the stack.
+
+        The cyclic garbage collector is disabled during the build:
+        the trie has no cycle, and the collector would otherwise scan
+        all nodes over and over as they get allocated.
+        """
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return cls._from_sorted(words if presorted else sorted(words))
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    @classmethod
+    def _from_sorted(cls, words):
+        """Returns: a trie built from sorted words, see from_iterable."""
+        root = cls()
+        path = [root]   # nodes along the previous word
+        previous = ""
+        for word in words:
+            if word < previous:
+                raise ValueError(
+                    'words are not sorted: {word} after {previous}'.format(
+                        word=word, previous=previous))
+            common = 0
+            ncommon = min(len(word), len(previous))
+            while common < ncommon and word[common] == previous[common]:
+                common += 1
+            # nodes below the common prefix are complete
+            while len(path) > common + 1:
+                node = path.pop()
+                path[-1]._length += node._length
+            node = path[-1]
+            for char in word[common:]:
+                child = cls()
+                node._children[char] = child
+                path.append(child)
+                node = child
+            if not node._valid:
+                node._valid = True
+                node._length += 1
+            previous = word
+        while len(path) > 1:
+            node = path.pop()
+            path[-1]._length += node._length
+        return root
+
     def is_valid(self):
         """Returns: True if this Trie node corresponds to a valid key."""
         return self._valid
@@ -64,6 +139,110 @@ class Trie(object):
         for key, child in sorted( self._children.iteritems() ):
             child.traverse(results, word+key)
 
+    def complete(self, prefix="", limit=None):
+        """Yields: the valid words starting with prefix,
+        in lexicographical order.
+
+        Words are produced lazily, with an explicit stack: only the
+        children of the nodes actually reached get sorted.
+
+        Args:
+          prefix  beginning of the words, included in the results
+          limit   maximum number of words to yield, None for all.
+        """
+        if limit is not None and limit <= 0:
+            return
+        node = self.subtrie(prefix)
+        if node is None:
+            return
+        nwords = 0
+        todo = [(prefix, node)]
+        while todo:
+            word, node = todo.pop()
+            if node._valid:
+                yield word
+                nwords += 1
+                if nwords == limit:
+                    return
+            children = node._children
+            for key in sorted(children, reverse=True):
+                todo.append((word + key, children[key]))
+
+    def top_k(self, prefix, k):
+        """Returns: the k words starting with prefix with highest weight.
+
+        Words with the same weight are sorted lexicographically.
+
+        This is a best-first search: sub-tries are explored in the order
+        of the maximum weight they contain, cached on each node at
+        insertion. A word is returned only when nothing left in the queue
+        can beat it, so only the branches leading to the best words
+        are explored, whatever the size of the sub-trie.
+        If the weight of a word is lowered by inserting it again, the
+        cached maxima are not lowered. The result is still correct, but
+        the search may explore a bit more.
+        """
+        node = self.subtrie(prefix)
+        if node is None:
+            return []
+        results = []
+        # (-weight, word, 0, None) for words
+        # (-max weight, prefix, 1, node) for sub-tries still to explore
+        todo = [(-node._max_weight, prefix, 1, node)]
+        while todo and len(results) < k:
+            weight, word, is_node, node = heapq.heappop(todo)
+            if not is_node:
+                results.append(word)
+                continue
+            if node._valid:
+                heapq.heappush(todo, (-node._weight, word, 0, None))
+            for key, child in node._children.iteritems():
+                heapq.heappush(todo, (-child._max_weight, word + key, 1, child))
+        return results
+
+    def search_within(self, word, max_edits):
+        """Returns: list of (key, distance) for the valid keys within
+        max_edits of word, in lexicographical order.
+
+        The distance is the Levenshtein distance: number of character
+        insertions, deletions and substitutions.
+
+        Each node on the way down gets one row of the dynamic programming
+        table, computed from the row of its parent: the distances between
+        the node prefix and all prefixes of word. The words sharing a prefix
+        share the rows, and a sub-trie is skipped as soon as all values
+        in its row exceed max_edits.
+        The distance between prefixes of lengths i and j is at least
+        abs(i - j), so only the band of 2*max_edits+1 cells around the
+        diagonal is computed, the other cells are capped to max_edits+1.
+        """
+        results = []
+        nletters = len(word)
+        too_far = max_edits + 1
+        first_row = [min(i, too_far) for i in range(nletters + 1)]
+        if self._valid and first_row[-1] <= max_edits:
+            results.append(("", first_row[-1]))
+        todo = [(key, child, first_row) for key, child in
+                sorted(self._children.iteritems(), reverse=True)]
+        while todo:
+            prefix, node, previous_row = todo.pop()
+            char = prefix[-1]
+            depth = len(prefix)
+            row = [too_far] * (nletters + 1)
+            row[0] = min(depth, too_far)
+            for i in range(max(1, depth - max_edits),
+                           min(nletters, depth + max_edits) + 1):
+                row[i] = min(row[i-1] + 1,
+                             previous_row[i] + 1,
+                             previous_row[i-1] + (word[i-1] != char))
+            if node._valid and row[-1] <= max_edits:
+                results.append((prefix, row[-1]))
+            if min(row) <= max_edits:
+                for key, child in sorted(node._children.iteritems(),
+                                         reverse=True):
+                    todo.append((prefix + key, child, row))
+        return results
+
     def iteritems(self):
         # not the right feature? i'd like to be able to iterate on letters along a branch
         return self._children.iteritems()
@@ -73,9 +252,9 @@ class Trie(object):
         return self._children[key]
 
     def __contains__(self, key):
-        #TODO not the right implementation...
-        # i would like to be able to ask if a word is in the trie
-        return key in self._children
+        """Returns: True if key is a valid word in the trie."""
+        sub = self.subtrie(key)
+        return sub is not None and sub.is_valid()
 
     def __len__(self):
         """Number of valid keys in the trie."""
@@ -88,9 +267,20 @@ class Trie(object):
             children=",".join(self._children.keys())
             )
 
+    def node_count(self):
+        '''Returns: number of nodes in the trie.'''
+        count = 0
+        todo = [self]
+        while todo:
+            node = todo.pop()
+            count += 1
+            todo.extend(node._children.itervalues())
+        return count
+
     def get_words(self):
         '''prints all words in the trie.
         #TODO words are not complete for sub-tries (no info about ancestors)
+        # use complete(prefix) on the root trie to get the full words.
         '''
         words = []
         self.traverse(words)
@@ -115,29 +305,39 @@ def build_test_trie():
 ttrie = build_test_trie()        
 
 
-def build_dict_trie(nwords=-1, mod=1, filename='/usr/share/dict/words'):
+def build_dict_trie(nwords=-1, mod=1, filename='/usr/share/dict/words',
+                    trie_class=Trie):
     """Returns: A trie containing the words from a dictionary.
 
     Args:
-      nwords    number of words to insert
-      mod       number of words to skip between selected words
-      filename  path to a file containing one word per line
+      nwords      number of words to insert
+      mod         number of words to skip between selected words
+      filename    path to a file containing one word per line
+      trie_class  trie implementation to fill, e.g. CompactTrie
     """
-    trie = Trie()
-    ifile = open(filename)
-    nwinc = 0
-    for iw, word in enumerate(ifile):
-        word = word.rstrip().lower()
-        if iw % mod:
-            continue
+    trie = trie_class()
+    for nwinc, word in enumerate(read_words(nwords, mod, filename)):
         if nwinc % 10000 == 0:
             print nwinc
-        if nwinc == nwords:
-            break
         trie.insert(word)
-        nwinc += 1
     return trie
 
+
+def read_words(nwords=-1, mod=1, filename='/usr/share/dict/words'):
+    """Yields: the lower-cased words from a dictionary.
+
+    Args are the same as for build_dict_trie.
+    """
+    with open(filename) as ifile:
+        nwinc = 0
+        for iw, word in enumerate(ifile):
+            if iw % mod:
+                continue
+            if nwinc == nwords:
+                break
+            yield word.rstrip().lower()
+            nwinc += 1
+
 # dtrie = build_dict_trie()
 
         
@@ -176,16 +376,105 @@ class TrieCase(unittest.TestCase):
     def test_contains(self):
         trie = build_test_trie()
         self.assertIn('a', trie)
+        self.assertIn('badminton', trie)
         self.assertNotIn('z', trie)
+        self.assertNotIn('badm', trie)
 
     def test_length(self):
         trie = build_test_trie()
         self.assertEqual(len(trie), 6)
 
+    def test_node_count(self):
+        self.assertEqual(build_test_trie().node_count(), 17)
+
+    def test_complete(self):
+        trie = build_test_trie()
+        self.assertEqual(list(trie.complete("ba")), ["bad", "badminton"])
+        self.assertEqual(list(trie.complete()), trie.get_words())
+        self.assertEqual(list(trie.complete("b", limit=2)), ["b", "bad"])
+        self.assertEqual(list(trie.complete("z")), [])
+
+    def test_complete_is_lazy(self):
+        trie = build_test_trie()
+        words = trie.complete("a")
+        self.assertEqual(next(words), "a")
+        self.assertEqual(next(words), "abron")
+        self.assertRaises(StopIteration, next, words)
+
+    def test_top_k(self):
+        trie = Trie()
+        weights = dict(bad=5, badminton=10, bid=7, b=1, a=8, abron=2)
+        for word, weight in weights.iteritems():
+            trie.insert(word, weight=weight)
+        self.assertEqual(trie.top_k("b", 2), ["badminton", "bid"])
+        self.assertEqual(trie.top_k("", 3), ["badminton", "a", "bid"])
+        self.assertEqual(trie.top_k("ba", 5), ["badminton", "bad"])
+        self.assertEqual(trie.top_k("z", 5), [])
+
+    def test_top_k_ties(self):
+        trie = build_test_trie()
+        self.assertEqual(trie.top_k("b", 3), ["b", "bad", "badminton"])
+
+    def test_search_within(self):
+        trie = build_test_trie()
+        self.assertEqual(trie.search_within("bad", 0), [("bad", 0)])
+        self.assertEqual(trie.search_within("bad", 1),
+                         [("bad", 0), ("bid", 1)])
+        self.assertEqual(trie.search_within("bd", 1),
+                         [("b", 1), ("bad", 1), ("bid", 1)])
+        self.assertEqual(trie.search_within("badmintn", 2),
+                         [("badminton", 1)])
+        self.assertEqual(trie.search_within("", 1), [("a", 1), ("b", 1)])
+
+    def test_from_iterable(self):
+        words = ["a", "abron", "b", "bad", "badminton", "bid"]
+        trie = Trie.from_iterable(iter(words))
+        self.assertEqual(trie.get_words(), words)
+        self.assertEqual(len(trie), 6)
+        self.assertEqual(len(trie.subtrie("ba")), 2)
+        self.assertTrue(trie.subtrie("bad").is_valid())
+        self.assertFalse(trie.subtrie("ba").is_valid())
+
+    def test_from_iterable_duplicates(self):
+        trie = Trie.from_iterable(["bad", "bad", "badminton"])
+        self.assertEqual(len(trie), 2)
+
+    def test_from_iterable_unsorted(self):
+        words = ["bid", "a", "bad"]
+        self.assertRaises(ValueError, Trie.from_iterable, words)
+        trie = Trie.from_iterable(words, presorted=False)
+        self.assertEqual(trie.get_words(), sorted(words))
+
 if __name__ == "__main__":
 
     import pprint
     import sys
+    import time
 
-    unittest.main()
+    if len(sys.argv) > 1:
+        # insert throughput, e.g. python trie.py /usr/share/dict/words
+        words = list(read_words(filename=sys.argv[1]))
+        start = time.time()
+        trie = Trie()
+        for word in words:
+            trie.insert(word)
+        insert_time = time.time() - start
+        del trie
+        start = time.time()
+        trie = Trie.from_iterable(words, presorted=False)
+        bulk_time = time.time() - start
+        print 'words          ', len(words)
+        print 'insert (w/s)   ', len(words) / insert_time
+        print 'from_iterable  ', len(words) / bulk_time
+        sample = words[::len(words) / 100 or 1]
+        for max_edits in [1, 2]:
+            start = time.time()
+            nresults = sum(len(trie.search_within(word, max_edits))
+                           for word in sample)
+            print 'search_within {max_edits} (ms/word)'.format(
+                max_edits=max_edits), \
+                (time.time() - start) / len(sample) * 1e3, \
+                '- matches/word', float(nresults) / len(sample)
+    else:
+        unittest.main()
 
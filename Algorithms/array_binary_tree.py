@@ -0,0 +1,229 @@
+import unittest
+import numpy as np
+
+from binary_tree import Node, NodeSquared, preorder_recursive
+
+'''Binary tree stored as a struct of arrays.
+
+Each binary_tree.Node is a full python object, with a dictionary of
+attributes: a million-node tree costs hundreds of MB, and a traversal
+chases pointers all over the memory.
+
+Here, the nodes are numbered, and the tree is stored in three arrays:
+
+  values[i]   value of node i
+  left[i]     index of the left child of node i, or -1
+  right[i]    index of the right child of node i, or -1
+
+A node costs 16 bytes for integer or float values.
+Operations on all values at once, like squaring them as done by
+NodeSquared.visit, are vectorised with numpy instead of visiting each node.
+
+The traversals return the node indices in the traversal order, so that
+the values can be taken in this order with a single numpy indexing.
+'''
+
+
+class ArrayBinaryTree(object):
+    '''
+    Binary tree with values and children indices in numpy arrays.
+    '''
+
+    def __init__(self, values, left, right, root=0):
+        '''constructor.
+
+        values: array of node values
+        left, right: arrays of children indices, -1 for no child
+        root: index of the root node, -1 for an empty tree
+        '''
+        self.values = np.asarray(values)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        if not len(self.values) == len(self.left) == len(self.right):
+            raise ValueError('values, left and right must have the same size')
+        self.root = root
+
+    @classmethod
+    def from_nodes(cls, root, dtype=None):
+        '''Returns: ArrayBinaryTree with the same structure and values
+        as the tree of binary_tree.Node rooted at root.
+
+        The nodes are numbered in pre-order. dtype is the numpy type
+        of the values, guessed by numpy by default.
+        '''
+        if root is None:
+            return cls([], [], [], root=-1)
+        values = []
+        left = []
+        right = []
+        # (node, index of the parent, True if left child)
+        todo = [(root, -1, False)]
+        while todo:
+            node, parent, is_left = todo.pop()
+            index = len(values)
+            values.append(node.value)
+            left.append(-1)
+            right.append(-1)
+            if is_left:
+                left[parent] = index
+            elif parent >= 0:
+                right[parent] = index
+            if node.right:
+                todo.append((node.right, index, False))
+            if node.left:
+                todo.append((node.left, index, True))
+        return cls(np.array(values, dtype=dtype), left, right)
+
+    def to_nodes(self, node_class=Node):
+        '''Returns: the root of a tree of node_class objects,
+        e.g. binary_tree.Node, with the same structure and values.'''
+        if self.root < 0:
+            return None
+        nodes = [node_class(value) for value in self.values.tolist()]
+        for node, left, right in zip(nodes, self.left.tolist(),
+                                     self.right.tolist()):
+            node.set_children(nodes[left] if left >= 0 else None,
+                              nodes[right] if right >= 0 else None)
+        return nodes[self.root]
+
+    def __len__(self):
+        '''Number of nodes.'''
+        return len(self.values)
+
+    def map(self, function):
+        '''Returns: a tree with the same structure, and values
+        function(values). function is applied to the whole array of values
+        at once, e.g. np.square.'''
+        return ArrayBinaryTree(function(self.values), self.left, self.right,
+                               self.root)
+
+    def preorder_indices(self):
+        '''pre-order, iterative implementation.
+        Returns: array of node indices.'''
+        left = self.left.tolist()
+        right = self.right.tolist()
+        order = []
+        todo = [self.root] if self.root >= 0 else []
+        while todo:
+            index = todo.pop()
+            order.append(index)
+            if right[index] >= 0:
+                todo.append(right[index])
+            if left[index] >= 0:
+                todo.append(left[index])
+        return np.array(order, dtype=np.int32)
+
+    def inorder_indices(self):
+        '''in-order, iterative implementation.
+        Returns: array of node indices.'''
+        left = self.left.tolist()
+        right = self.right.tolist()
+        order = []
+        todo = []
+        index = self.root
+        while index >= 0 or todo:
+            if index >= 0:
+                todo.append(index)
+                index = left[index]
+            else:
+                index = todo.pop()
+                order.append(index)
+                index = right[index]
+        return np.array(order, dtype=np.int32)
+
+    def postorder_indices(self):
+        '''post-order, iterative implementation.
+        node, right, left is a pre-order going right first:
+        reversing it gives left, right, node.
+        Returns: array of node indices.'''
+        left = self.left.tolist()
+        right = self.right.tolist()
+        order = []
+        todo = [self.root] if self.root >= 0 else []
+        while todo:
+            index = todo.pop()
+            order.append(index)
+            if left[index] >= 0:
+                todo.append(left[index])
+            if right[index] >= 0:
+                todo.append(right[index])
+        order.reverse()
+        return np.array(order, dtype=np.int32)
+
+    def preorder(self):
+        '''Returns: array of values in pre-order.'''
+        return self.values[self.preorder_indices()]
+
+    def inorder(self):
+        '''Returns: array of values in in-order.'''
+        return self.values[self.inorder_indices()]
+
+    def postorder(self):
+        '''Returns: array of values in post-order.'''
+        return self.values[self.postorder_indices()]
+
+    def __repr__(self):
+        return 'ArrayBinaryTree: {n} nodes, root {root}'.format(
+            n=len(self), root=self.root)
+
+
+class ArrayBinaryTreeTestCase( unittest.TestCase ):
+
+    def setUp(self):
+        '''
+        same tree as in binary_tree.BinaryTreeTestCase
+
+            0
+           / \\
+          2   1
+         / \\
+        4   3
+         \\
+          5
+        '''
+        self.nodes = dict( (i, Node(i) ) for i in range(6) )
+        self.nodes[4].set_children( self.nodes[2], self.nodes[5] )
+        self.nodes[2].set_children( self.nodes[0], self.nodes[3] )
+        self.nodes[0].right = self.nodes[1]
+        self.root = self.nodes[4]
+        self.tree = ArrayBinaryTree.from_nodes(self.root)
+
+    def test_from_nodes(self):
+        self.assertEqual(len(self.tree), 6)
+        self.assertEqual(self.tree.values.tolist(), [4, 2, 0, 1, 3, 5])
+        self.assertEqual(self.tree.left.tolist(), [1, 2, -1, -1, -1, -1])
+        self.assertEqual(self.tree.right.tolist(), [5, 4, 3, -1, -1, -1])
+
+    def test_traversals(self):
+        self.assertEqual(self.tree.preorder().tolist(), [4, 2, 0, 1, 3, 5])
+        self.assertEqual(self.tree.inorder().tolist(), range(6))
+        self.assertEqual(self.tree.postorder().tolist(), [1, 0, 3, 2, 5, 4])
+
+    def test_map(self):
+        squared = self.tree.map(np.square)
+        self.assertEqual(squared.inorder().tolist(),
+                         [i**2 for i in range(6)])
+        # same as visiting NodeSquared nodes
+        result = []
+        preorder_recursive(self.tree.to_nodes(NodeSquared), result)
+        self.assertEqual(squared.preorder().tolist(), result)
+
+    def test_to_nodes(self):
+        root = self.tree.to_nodes()
+        result = []
+        preorder_recursive(root, result)
+        self.assertEqual(result, [4, 2, 0, 1, 3, 5])
+
+    def test_empty(self):
+        tree = ArrayBinaryTree.from_nodes(None)
+        self.assertEqual(len(tree), 0)
+        self.assertEqual(tree.inorder().tolist(), [])
+        self.assertEqual(tree.postorder().tolist(), [])
+        self.assertEqual(tree.to_nodes(), None)
+
+    def test_sizes(self):
+        self.assertRaises(ValueError, ArrayBinaryTree, [1, 2], [-1], [-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,319 @@
+import unittest
+from itertools import islice, izip
+from stack import Stack
+from binary_tree import Node, inorder_recursive
+
+'''Self-balancing binary search tree (AVL tree).
+http://en.wikipedia.org/wiki/AVL_tree
+
+In a binary search tree, the in-order traversal gives the values in
+increasing order: for each node, the values in the left subtree are
+smaller, and the values in the right subtree are larger.
+
+A lookup goes down a single branch, so it is as slow as the tree is
+high. If the values are inserted in increasing order, each new value
+becomes the right child of the previous one, and the tree is just a
+chain: lookups are O(n).
+
+The AVL tree keeps the heights of the two subtrees of each node within
+one of each other, by rotating the nodes after each insertion or
+deletion. Therefore the height stays O(log n), whatever the order of
+insertion.
+'''
+
+
+class AVLNode(Node):
+    '''
+    binary_tree.Node, with the height of the subtree rooted at the node.
+    '''
+
+    def __init__(self, value):
+        super(AVLNode, self).__init__(value)
+        self.height = 1
+
+
+def _height(node):
+    return node.height if node else 0
+
+
+def _update(node):
+    '''update the height of node from the ones of its children.'''
+    node.height = 1 + max(_height(node.left), _height(node.right))
+
+
+def _rotate_right(node):
+    '''
+    Returns: the new root of the subtree.
+
+          node         left
+          /  \\        /  \\
+        left  c  ->   a   node
+        /  \\             /  \\
+       a    b           b    c
+    '''
+    left = node.left
+    node.left = left.right
+    left.right = node
+    _update(node)
+    _update(left)
+    return left
+
+
+def _rotate_left(node):
+    '''mirror of _rotate_right. Returns: the new root of the subtree.'''
+    right = node.right
+    node.right = right.left
+    right.left = node
+    _update(node)
+    _update(right)
+    return right
+
+
+def _rebalance(node):
+    '''Returns: the new root of the subtree, balanced.
+    The subtrees of node must be balanced, and their heights differ by
+    two at most.'''
+    _update(node)
+    balance = _height(node.left) - _height(node.right)
+    if balance > 1:
+        if _height(node.left.left) < _height(node.left.right):
+            node.left = _rotate_left(node.left)
+        return _rotate_right(node)
+    if balance < -1:
+        if _height(node.right.right) < _height(node.right.left):
+            node.right = _rotate_right(node.right)
+        return _rotate_left(node)
+    return node
+
+
+class AVLTree(object):
+    '''
+    AVL tree of AVLNode. The values must be comparable,
+    and are stored only once.
+    '''
+
+    def __init__(self):
+        self.root = None
+        self._size = 0
+
+    @classmethod
+    def bulk_load(cls, sorted_values):
+        '''Returns: a perfectly balanced tree containing sorted_values,
+        built in O(n).
+        Raises: ValueError if the values are not sorted and unique.'''
+        values = list(sorted_values)
+        for previous, value in izip(values, islice(values, 1, None)):
+            if not previous < value:
+                raise ValueError(
+                    'values are not sorted and unique: {value} after '
+                    '{previous}'.format(value=value, previous=previous))
+        tree = cls()
+        tree._size = len(values)
+        tree.root = cls._build(values, 0, len(values))
+        return tree
+
+    @staticmethod
+    def _build(values, start, end):
+        '''Returns: the root of a balanced subtree with values[start:end].
+        recursion depth is log(n).'''
+        if start >= end:
+            return None
+        middle = (start + end) // 2
+        node = AVLNode(values[middle])
+        node.left = AVLTree._build(values, start, middle)
+        node.right = AVLTree._build(values, middle + 1, end)
+        _update(node)
+        return node
+
+    def insert(self, value):
+        '''Insert value in the tree.
+        Returns: True if value was inserted, False if already there.'''
+        size = self._size
+        self.root = self._insert(self.root, value)
+        return self._size > size
+
+    def _insert(self, node, value):
+        '''Returns: the new root of the subtree, after insertion.
+        recursion depth is the height of the tree, O(log n).'''
+        if node is None:
+            self._size += 1
+            return AVLNode(value)
+        if value < node.value:
+            node.left = self._insert(node.left, value)
+        elif value > node.value:
+            node.right = self._insert(node.right, value)
+        else:
+            return node
+        return _rebalance(node)
+
+    def delete(self, value):
+        '''Remove value from the tree.
+        Returns: True if value was removed, False if not found.'''
+        size = self._size
+        self.root = self._delete(self.root, value)
+        return self._size < size
+
+    def _delete(self, node, value):
+        '''Returns: the new root of the subtree, after deletion.'''
+        if node is None:
+            return None
+        if value < node.value:
+            node.left = self._delete(node.left, value)
+        elif value > node.value:
+            node.right = self._delete(node.right, value)
+        else:
+            if node.left is None or node.right is None:
+                self._size -= 1
+                return node.left or node.right
+            # replacing the value by the smallest one in the right subtree,
+            # and removing this one instead
+            successor = node.right
+            while successor.left:
+                successor = successor.left
+            node.value = successor.value
+            node.right = self._delete(node.right, successor.value)
+        return _rebalance(node)
+
+    def find(self, value):
+        '''Returns: the node holding value, or None.'''
+        node = self.root
+        while node:
+            if value < node.value:
+                node = node.left
+            elif value > node.value:
+                node = node.right
+            else:
+                return node
+        return None
+
+    def __contains__(self, value):
+        return self.find(value) is not None
+
+    def range(self, lo, hi):
+        '''Yields: the values v such that lo <= v < hi, in increasing order.
+        lazy, iterative in-order traversal, skipping the subtrees
+        that are out of range.'''
+        todo = Stack()
+        node = self.root
+        while node or len(todo):
+            if node:
+                if node.value >= lo:
+                    todo.append(node)
+                    node = node.left
+                else:
+                    # left subtree too small
+                    node = node.right
+            else:
+                node = todo.pop()
+                if node.value >= hi:
+                    return
+                yield node.value
+                node = node.right
+
+    def __iter__(self):
+        '''Yields: all values in increasing order.'''
+        node = self.root
+        todo = Stack()
+        while node or len(todo):
+            if node:
+                todo.append(node)
+                node = node.left
+            else:
+                node = todo.pop()
+                yield node.value
+                node = node.right
+
+    def height(self):
+        '''Returns: height of the tree, 0 if empty.'''
+        return _height(self.root)
+
+    def __len__(self):
+        '''Returns: number of values.'''
+        return self._size
+
+
+class AVLTreeTestCase( unittest.TestCase ):
+
+    def check_balanced(self, node):
+        '''Returns: height of the subtree, checking the AVL property
+        and the heights stored in the nodes.'''
+        if node is None:
+            return 0
+        left = self.check_balanced(node.left)
+        right = self.check_balanced(node.right)
+        self.assertLessEqual(abs(left - right), 1)
+        self.assertEqual(node.height, 1 + max(left, right))
+        return node.height
+
+    def test_sorted_insertion(self):
+        tree = AVLTree()
+        for value in range(1000):
+            self.assertTrue(tree.insert(value))
+        self.assertFalse(tree.insert(10))
+        self.assertEqual(len(tree), 1000)
+        self.assertEqual(list(tree), range(1000))
+        self.check_balanced(tree.root)
+        # perfect balance would be 10
+        self.assertLessEqual(tree.height(), 11)
+
+    def test_inorder(self):
+        tree = AVLTree()
+        for value in [5, 2, 8, 1, 9, 3]:
+            tree.insert(value)
+        result = []
+        inorder_recursive(tree.root, result)
+        self.assertEqual(result, [1, 2, 3, 5, 8, 9])
+
+    def test_find(self):
+        tree = AVLTree.bulk_load(range(0, 100, 2))
+        self.assertIn(42, tree)
+        self.assertNotIn(43, tree)
+        self.assertEqual(tree.find(42).value, 42)
+        self.assertEqual(tree.find(-1), None)
+
+    def test_delete(self):
+        tree = AVLTree()
+        for value in range(100):
+            tree.insert(value)
+        for value in range(0, 100, 3):
+            self.assertTrue(tree.delete(value))
+        self.assertFalse(tree.delete(0))
+        expected = [value for value in range(100) if value % 3]
+        self.assertEqual(list(tree), expected)
+        self.assertEqual(len(tree), len(expected))
+        self.check_balanced(tree.root)
+
+    def test_delete_all(self):
+        tree = AVLTree.bulk_load(range(10))
+        for value in [5, 0, 9, 3, 1, 2, 8, 7, 6, 4]:
+            tree.delete(value)
+            self.check_balanced(tree.root)
+        self.assertEqual(tree.root, None)
+        self.assertEqual(len(tree), 0)
+
+    def test_range(self):
+        tree = AVLTree.bulk_load(range(0, 100, 2))
+        self.assertEqual(list(tree.range(10, 20)), [10, 12, 14, 16, 18])
+        self.assertEqual(list(tree.range(11, 15)), [12, 14])
+        self.assertEqual(list(tree.range(200, 300)), [])
+        self.assertEqual(list(tree.range(-10, 3)), [0, 2])
+        values = tree.range(0, 100)
+        self.assertEqual(next(values), 0)
+
+    def test_bulk_load(self):
+        tree = AVLTree.bulk_load(range(1023))
+        self.assertEqual(tree.height(), 10)
+        self.assertEqual(len(tree), 1023)
+        self.check_balanced(tree.root)
+        tree.insert(2000)
+        self.check_balanced(tree.root)
+        self.assertEqual(AVLTree.bulk_load([]).height(), 0)
+        self.assertEqual(len(AVLTree.bulk_load([])), 0)
+
+    def test_bulk_load_rejects_unsorted(self):
+        self.assertRaises(ValueError, AVLTree.bulk_load, [1, 3, 2])
+        self.assertRaises(ValueError, AVLTree.bulk_load, [1, 2, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+'''Benchmarks for the binary tree algorithms.
+
+Each benchmark runs in a new process, to get a clean peak memory (RSS).
+
+Usage:
+  python benchmark_binary_tree.py [number of nodes] [number of BST values]
+'''
+
+import sys
+import time
+
+from benchmark_process import peak_rss_mb, run
+from binary_tree import Node, inorder_iterative, inorder_morris
+from avl_tree import AVLTree
+
+
+def degenerate_chain(nnodes):
+    '''Returns: the root of a tree in which each node is the left child
+    of the previous one. The in-order traversal starts from the bottom,
+    so a stack-based traversal has to keep all nodes on the stack.'''
+    root = Node(nnodes - 1)
+    node = root
+    for value in reversed(range(nnodes - 1)):
+        node.left = Node(value)
+        node = node.left
+    return root
+
+
+class _Counter(object):
+    '''Replaces the result list, so that it does not count in memory.'''
+
+    def __init__(self):
+        self.count = 0
+
+    def append(self, value):
+        self.count += 1
+
+
+def _run_traversal(traversal, nnodes):
+    '''Returns: time of the traversal of a chain, and increase of
+    the peak memory in MB during the traversal.'''
+    root = degenerate_chain(nnodes)
+    rss_before = peak_rss_mb()
+    result = _Counter()
+    start = time.time()
+    traversal(root, result)
+    elapsed = time.time() - start
+    assert result.count == nnodes
+    return elapsed, peak_rss_mb() - rss_before
+
+
+def benchmark_morris(nnodes=1000000):
+    '''Morris vs stack-based in-order traversal of a degenerate chain.'''
+    print 'in-order traversal of a degenerate chain of', nnodes, 'nodes'
+    for traversal in [inorder_iterative, inorder_morris]:
+        elapsed, memory = run(_run_traversal, traversal, nnodes)
+        print '  {name:20} {time:6.2f} s {memory:8.1f} MB'.format(
+            name=traversal.__name__, time=elapsed, memory=memory)
+
+
+def bst_insert(root, value):
+    '''Insert value in the unbalanced binary search tree rooted at root.
+    Returns: the root.'''
+    if root is None:
+        return Node(value)
+    node = root
+    while True:
+        if value < node.value:
+            if node.left is None:
+                node.left = Node(value)
+                return root
+            node = node.left
+        elif value > node.value:
+            if node.right is None:
+                node.right = Node(value)
+                return root
+            node = node.right
+        else:
+            return root
+
+
+def bst_find(root, value):
+    '''Returns: the node holding value in the binary search tree, or None.'''
+    node = root
+    while node and node.value != value:
+        node = node.left if value < node.value else node.right
+    return node
+
+
+def _run_search_tree(layout, nvalues):
+    '''Returns: time to insert nvalues sorted values in a search tree,
+    and time to look up all of them.'''
+    values = range(nvalues)
+    start = time.time()
+    if layout == 'unbalanced':
+        root = None
+        for value in values:
+            root = bst_insert(root, value)
+        find = lambda value: bst_find(root, value)
+    else:
+        tree = AVLTree()
+        for value in values:
+            tree.insert(value)
+        find = tree.find
+    insert_time = time.time() - start
+    start = time.time()
+    for value in values:
+        assert find(value) is not None
+    return insert_time, time.time() - start
+
+
+def benchmark_search_tree(nvalues=5000):
+    '''AVL tree vs unbalanced binary search tree, with sorted insertions:
+    the unbalanced tree is a chain, so each operation is O(n).'''
+    print 'search tree with', nvalues, 'values inserted in sorted order'
+    for layout in ['unbalanced', 'avl']:
+        insert_time, find_time = run(_run_search_tree, layout, nvalues)
+        print '  {name:20} insert {insert:6.2f} s  find {find:6.2f} s'.format(
+            name=layout, insert=insert_time, find=find_time)
+
+
+if __name__ == '__main__':
+
+    nnodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    nvalues = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    benchmark_morris(nnodes)
+    benchmark_search_tree(nvalues)
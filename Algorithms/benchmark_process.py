@@ -0,0 +1,29 @@
+'''Helpers of the benchmarks: peak memory, and measurements in a new process.
+
+The peak resident memory (RSS) of a process never decreases, so each
+measurement runs in a new process, in which the peak memory only
+contains what the measurement built.
+'''
+
+import sys
+import resource
+from multiprocessing import Pool
+
+
+def peak_rss_mb():
+    '''Returns: peak resident memory of this process, in MB.'''
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on linux, bytes on mac os
+    if sys.platform == 'darwin':
+        maxrss /= 1024.
+    return maxrss / 1024.
+
+
+def run(function, *args):
+    '''Returns: function(*args), computed in a new process.'''
+    pool = Pool(1)
+    try:
+        return pool.apply(function, args)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,300 @@
+'''Benchmark matrix of the traversal implementations.
+
+The modules tree, binary_tree, polytree, the visitor pattern modules and
+visitor_engine provide several implementations of the same traversal,
+some of them "for better performance". This benchmark times each
+implementation on generated trees of several shapes and sizes:
+
+  balanced    each node has two children
+  degenerate  each node has one child: a chain, as deep as it is long
+  wide        each node has many children (--fanout)
+  polytree    random tree in which some nodes have a second parent
+
+The binary tree traversals only run on the balanced and degenerate shapes,
+and the tree traversals do not run on the polytree shape, in which
+they would visit the nodes with two parents twice.
+
+For each traversal, shape and size, the tree is built and traversed in a
+new process, and the record contains:
+  visits       number of values in the result. It can be larger than the
+               number of nodes, when a node is visited once per parent.
+  ops_per_s    visits per second, for the best of --repeat traversals
+  peak_rss_mb  peak memory of the process, in MB
+  delta_rss_mb increase of the peak memory while building and traversing
+               the tree, in MB
+  error        e.g. the recursion limit reached on a degenerate tree
+
+The records are printed as one JSON record per line, and appended to the
+output file if one is given.
+
+Usage:
+  python benchmark_traversals.py
+  python benchmark_traversals.py -n 1000,100000 -s wide -o results.jsonl
+  python benchmark_traversals.py -m binary_tree -t inorder
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+from argparse import ArgumentParser
+
+import tree
+import binary_tree
+import polytree
+import tree_visitor_pattern
+import polytree_visitor_pattern
+import visitor_engine
+from benchmark_process import peak_rss_mb, run
+
+SHAPES = ['balanced', 'degenerate', 'wide', 'polytree']
+BINARY_SHAPES = ['balanced', 'degenerate']
+TREE_SHAPES = ['balanced', 'degenerate', 'wide']
+
+
+def make_shape(shape, nnodes, fanout=50, seed=0):
+    '''Returns: list of the children indices of each node.
+    node 0 is the root, and the children of a node come after it.'''
+    if shape == 'balanced':
+        fanout = 2
+    if shape in ('balanced', 'wide'):
+        return [range(fanout * i + 1, min(fanout * (i + 1) + 1, nnodes))
+                for i in range(nnodes)]
+    if shape == 'degenerate':
+        return [[i + 1] for i in range(nnodes - 1)] + [[]]
+    if shape == 'polytree':
+        # each node gets a random parent among the previous nodes,
+        # and a second one with probability 0.2
+        rand = random.Random(seed)
+        children = [[] for i in range(nnodes)]
+        for i in range(1, nnodes):
+            parents = set([rand.randrange(i)])
+            if rand.random() < 0.2:
+                parents.add(rand.randrange(i))
+            for parent in sorted(parents):
+                children[parent].append(i)
+        return children
+    raise ValueError('unknown shape: ' + shape)
+
+
+def build_tree(node_class, children):
+    '''Returns: root of a tree of tree.Node-like node_class.'''
+    nodes = [node_class(i) for i in range(len(children))]
+    for node, links in zip(nodes, children):
+        node.set_children([nodes[i] for i in links])
+    return nodes[0]
+
+
+def build_binary_tree(children):
+    '''Returns: root of a tree of binary_tree.Node.
+    the first child is the left one, so a degenerate tree is a left chain.'''
+    nodes = [binary_tree.Node(i) for i in range(len(children))]
+    for node, links in zip(nodes, children):
+        links = [nodes[i] for i in links] + [None, None]
+        node.set_children(links[0], links[1])
+    return nodes[0]
+
+
+def build_polytree(node_class, children):
+    '''Returns: root of a polytree of polytree.Node-like node_class.'''
+    nodes = [node_class(i) for i in range(len(children))]
+    for parent, links in zip(nodes, children):
+        for i in links:
+            parent.add_child(nodes[i])
+            nodes[i].add_parent(parent)
+    return nodes[0]
+
+
+def _function(function, roots=False, *linktype):
+    '''Returns: run(root) calling function, which appends
+    the values to a result list, and returning the result.
+    roots is True if function takes a list of starting nodes.'''
+    def run_function(root):
+        result = []
+        function([root] if roots else root, result, *linktype)
+        return result
+    return run_function
+
+
+def _generator(function):
+    '''Returns: run(root) returning the values yielded by function.'''
+    return lambda root: list(function(root))
+
+
+def _visitor(visitor_class, *args):
+    '''Returns: run(root) returning the result of a visitor.'''
+    return lambda root: visitor_class(root, *args).result
+
+
+def _engine(name, linktype, track_visited=True):
+    '''Returns: run(root) returning the result of a traversal
+    of visitor_engine.'''
+    def run_engine(root):
+        engine = visitor_engine.VisitorEngine(linktype, track_visited)
+        traversal = getattr(engine, name)
+        return traversal([root], visitor_engine.ValueCollector()).result
+    return run_engine
+
+
+def _traversals():
+    '''Returns: dict (module, traversal) -> (shapes, build, run),
+    build(children) returns the root, run(root) the list of values.'''
+    traversals = dict()
+
+    build = lambda children: build_tree(tree.Node, children)
+    for name in ['bfs_recursive', 'bfs_iterative']:
+        traversals['tree', name] = (
+            TREE_SHAPES, build, _function(getattr(tree, name), True))
+    for name in ['dfs_recursive', 'dfs_iterative', 'dfs_iterative_2']:
+        traversals['tree', name] = (
+            TREE_SHAPES, build, _function(getattr(tree, name)))
+
+    for name in ['preorder_recursive', 'preorder_iterative', 'preorder_morris',
+                 'inorder_recursive', 'inorder_iterative_visit1',
+                 'inorder_iterative_visit2', 'inorder_iterative',
+                 'inorder_morris', 'postorder_recursive',
+                 'postorder_iterative_1', 'postorder_iterative']:
+        traversals['binary_tree', name] = (
+            BINARY_SHAPES, build_binary_tree,
+            _function(getattr(binary_tree, name)))
+    for name in ['iter_preorder', 'iter_inorder', 'iter_postorder']:
+        traversals['binary_tree', name] = (
+            BINARY_SHAPES, build_binary_tree,
+            _generator(getattr(binary_tree, name)))
+
+    build = lambda children: build_polytree(polytree.Node, children)
+    for linktype in ['children', 'undirected']:
+        for name in ['bfs_recursive', 'bfs_iterative']:
+            traversals['polytree', name + '/' + linktype] = (
+                SHAPES, build,
+                _function(getattr(polytree, name), True, linktype))
+        for name in ['dfs_recursive', 'dfs_iterative', 'dfs_iterative_2']:
+            traversals['polytree', name + '/' + linktype] = (
+                SHAPES, build,
+                _function(getattr(polytree, name), False, linktype))
+
+    build = lambda children: build_tree(tree_visitor_pattern.Node, children)
+    for name in ['DepthFirstSearch', 'BreadthFirstSearch']:
+        traversals['tree_visitor_pattern', name] = (
+            TREE_SHAPES, build,
+            _visitor(getattr(tree_visitor_pattern, name), None))
+
+    build = lambda children: build_polytree(polytree_visitor_pattern.Node,
+                                            children)
+    for linktype in ['children', 'undirected']:
+        for name in ['BreadthFirstSearch', 'BreadthFirstSearchIterative']:
+            traversals['polytree_visitor_pattern', name + '/' + linktype] = (
+                SHAPES, build,
+                _visitor(getattr(polytree_visitor_pattern, name), linktype))
+
+    build = lambda children: build_tree(tree_visitor_pattern.Node, children)
+    for name in ['depth_first', 'breadth_first']:
+        traversals['visitor_engine', name] = (
+            TREE_SHAPES, build, _engine(name, 'children', False))
+    build = lambda children: build_polytree(polytree_visitor_pattern.Node,
+                                            children)
+    for linktype in ['children', 'undirected']:
+        for name in ['depth_first', 'breadth_first']:
+            traversals['visitor_engine', name + '/' + linktype] = (
+                SHAPES, build, _engine(name, linktype))
+    return traversals
+
+
+TRAVERSALS = _traversals()
+
+
+def measure(module, traversal, shape, nnodes, fanout=50, repeat=3):
+    '''Returns: dict of measurements of a traversal on a tree.
+    The time is the best of repeat traversals. The tree is built again
+    before each traversal, as some traversals set a visited flag.'''
+    shapes, build, run_traversal = TRAVERSALS[module, traversal]
+    children = make_shape(shape, nnodes, fanout)
+    base_rss = peak_rss_mb()
+    # inorder_iterative_visit1 prints a line for each missing child
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    error = None
+    elapsed = float('inf')
+    try:
+        for i in range(repeat):
+            root = build(children)
+            start = time.time()
+            result = run_traversal(root)
+            elapsed = min(elapsed, time.time() - start)
+            del root
+    except RuntimeError as err:
+        # maximum recursion depth exceeded
+        result = []
+        error = str(err)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return dict(
+        module=module,
+        traversal=traversal,
+        shape=shape,
+        nnodes=nnodes,
+        visits=len(result),
+        time_s=elapsed if not error else None,
+        ops_per_s=len(result) / elapsed if not error else None,
+        peak_rss_mb=peak_rss_mb(),
+        delta_rss_mb=peak_rss_mb() - base_rss,
+        error=error,
+        )
+
+
+def run_matrix(sizes, shapes=SHAPES, modules=None, pattern='', fanout=50,
+               repeat=3, output=None):
+    '''Measure all traversals matching modules and pattern, on all
+    applicable shapes and sizes, each in a new process.
+
+    Returns: the list of result records.
+    '''
+    records = []
+    for module, traversal in sorted(TRAVERSALS):
+        if modules and module not in modules or pattern not in traversal:
+            continue
+        for shape in shapes:
+            if shape not in TRAVERSALS[module, traversal][0]:
+                continue
+            for nnodes in sizes:
+                record = run(measure, module, traversal, shape, nnodes,
+                             fanout, repeat)
+                record.update(
+                    time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    python=platform.python_version(),
+                    )
+                line = json.dumps(record, sort_keys=True)
+                print line
+                if output:
+                    with open(output, 'a') as ofile:
+                        ofile.write(line + '\n')
+                records.append(record)
+    return records
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--sizes', default='1000,10000',
+                        help='comma-separated numbers of nodes')
+    parser.add_argument('-s', '--shapes', default=','.join(SHAPES),
+                        help='comma-separated tree shapes')
+    parser.add_argument('-m', '--modules', default=None,
+                        help='comma-separated modules, all by default')
+    parser.add_argument('-t', '--traversal', default='',
+                        help='only the traversals containing this string')
+    parser.add_argument('-f', '--fanout', type=int, default=50,
+                        help='number of children in the wide shape')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of traversals, the best time is kept')
+    parser.add_argument('-o', '--output', default=None,
+                        help='file to which the JSON records are appended')
+    args = parser.parse_args()
+
+    run_matrix([int(size) for size in args.sizes.split(',')],
+               args.shapes.split(','),
+               args.modules.split(',') if args.modules else None,
+               args.traversal, args.fanout, args.repeat, args.output)
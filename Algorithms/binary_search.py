@@ -1,10 +1,14 @@
 
-def binary_search( sequence, element ): 
+def binary_search( sequence, element, debug=False ): 
+    '''Returns: index of element in the sorted sequence, or None.
+    debug: print the bounds at each iteration.
+    see sorted_search for batches of elements.'''
     smin = 0
     smax = len(sequence)
     while smax>smin: 
         midpoint = smin + (smax - smin)/2
-        print smin, midpoint, smax
+        if debug:
+            print smin, midpoint, smax
         if element > sequence[midpoint]:
             smin = midpoint+1 
         elif element < sequence[midpoint]:
@@ -17,9 +21,10 @@ if __name__ == '__main__':
     import sys
 
     element = int( sys.argv[1] )
-    sequence = range(100000000)
+    # xrange is a sequence with len and indexing: nothing in memory
+    sequence = xrange(100000000)
 
     # print element
     # print sequence
-    index = binary_search(sequence, element ) 
+    index = binary_search(sequence, element, debug=True ) 
     print 'resulting index', index
@@ -228,6 +228,112 @@ def postorder_iterative(root, result):
             todo.pop()
         
 
+def iter_preorder(root):
+    '''pre-order, lazy iterative implementation.
+    yields the visited values one by one, so that the caller can stop
+    whenever needed. memory usage is O(height) for the stack.'''
+    if root is None:
+        return
+    todo = Stack()
+    todo.append(root)
+    while len(todo):
+        node = todo.pop()
+        yield node.visit()
+        if node.right:
+            todo.append(node.right)
+        if node.left:
+            todo.append(node.left)
+
+
+def iter_inorder(root):
+    '''in-order, lazy iterative implementation, without visited flag.
+    the stack holds the nodes whose left subtree is being dealt with.'''
+    todo = Stack()
+    node = root
+    while node or len(todo):
+        if node:
+            todo.append(node)
+            node = node.left
+        else:
+            node = todo.pop()
+            yield node.visit()
+            node = node.right
+
+
+def iter_postorder(root):
+    '''post-order, lazy iterative implementation, without visited flag.
+    unlike postorder_iterative, the nodes are found in the right order:
+    a node is visited when coming back from its right subtree,
+    so no insertion at the start of the result, and O(n) in total.'''
+    todo = Stack()
+    node = root
+    last = None
+    while node or len(todo):
+        if node:
+            todo.append(node)
+            node = node.left
+        else:
+            top = todo.peek()
+            if top.right and last is not top.right:
+                # right subtree not done yet
+                node = top.right
+            else:
+                yield top.visit()
+                last = todo.pop()
+
+
+def inorder_morris(root, result):
+    '''in-order, Morris traversal, O(1) extra memory.
+
+    no stack and no recursion: before going down the left subtree of a
+    node, the right pointer of its in-order predecessor (the rightmost
+    node of the left subtree) is set to the node itself. Once the left
+    subtree is done, this thread brings us back to the node, and the
+    right pointer is restored.
+    The tree is modified during the traversal: do not share it with
+    another thread, and make sure visit does not raise.'''
+    node = root
+    while node:
+        if node.left is None:
+            result.append( node.visit() )
+            node = node.right
+            continue
+        pred = node.left
+        while pred.right and pred.right is not node:
+            pred = pred.right
+        if pred.right is None:
+            # first time here: thread and go left
+            pred.right = node
+            node = node.left
+        else:
+            # back from the left subtree: unthread
+            pred.right = None
+            result.append( node.visit() )
+            node = node.right
+
+
+def preorder_morris(root, result):
+    '''pre-order, Morris traversal, O(1) extra memory.
+    same as inorder_morris, but the node is visited on the first
+    arrival instead of when coming back from the left subtree.'''
+    node = root
+    while node:
+        if node.left is None:
+            result.append( node.visit() )
+            node = node.right
+            continue
+        pred = node.left
+        while pred.right and pred.right is not node:
+            pred = pred.right
+        if pred.right is None:
+            result.append( node.visit() )
+            pred.right = node
+            node = node.left
+        else:
+            pred.right = None
+            node = node.right
+
+
 class BinaryTreeTestCase( unittest.TestCase ):
 
     def setUp(self):
@@ -297,5 +403,43 @@ class BinaryTreeTestCase( unittest.TestCase ):
         postorder_iterative_1( self.root, result )
         self.assertEqual(result, [1, 0, 3, 2, 5, 4] )
 
+    def test_inorder_morris(self):
+        result = []
+        inorder_morris( self.root, result )
+        self.assertEqual(result, range(6) )
+        # the tree is restored
+        self.assertEqual(list(iter_preorder(self.root)), [4, 2, 0, 1, 3, 5] )
+
+    def test_preorder_morris(self):
+        result = []
+        preorder_morris( self.root, result )
+        self.assertEqual(result, [4, 2, 0, 1, 3, 5] )
+        result = []
+        inorder_recursive( self.root, result )
+        self.assertEqual(result, range(6) )
+
+    def test_iter_preorder(self):
+        self.assertEqual(list(iter_preorder(self.root)), [4, 2, 0, 1, 3, 5] )
+
+    def test_iter_inorder(self):
+        self.assertEqual(list(iter_inorder(self.root)), range(6) )
+
+    def test_iter_postorder(self):
+        self.assertEqual(list(iter_postorder(self.root)), [1, 0, 3, 2, 5, 4] )
+
+    def test_iter_empty(self):
+        for iter_order in [iter_preorder, iter_inorder, iter_postorder]:
+            self.assertEqual(list(iter_order(None)), [])
+
+    def test_iter_early_stop(self):
+        values = iter_inorder(self.root)
+        self.assertEqual(next(values), 0)
+        self.assertEqual(next(values), 1)
+
+    def test_iter_no_visited_flag(self):
+        list(iter_inorder(self.root))
+        list(iter_postorder(self.root))
+        self.assertFalse(any(node.visited for node in self.nodes.values()))
+
 if __name__ == '__main__':
     unittest.main()
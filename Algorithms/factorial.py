@@ -1,4 +1,9 @@
+import sys
+import math
+import time
 import numbers
+import unittest
+from collections import OrderedDict
 
 def validate_input(n):
     if not isinstance(n, numbers.Integral):
@@ -24,21 +29,213 @@ def factorial_recursive(n):
         return n * factorial_recursive(n-1)
 
 
+def product(lo, hi):
+    '''product of the integers in [lo, hi[, by binary splitting:
+    the two halves of the range are multiplied separately, so that the
+    big multiplications are done on numbers of the same size, which is
+    much faster than multiplying a big number by a small one n times.
+    the recursion depth is log(hi - lo).'''
+    if hi - lo <= 8:
+        res = 1
+        for val in xrange(lo, hi):
+            res *= val
+        return res
+    mid = (lo + hi) // 2
+    return product(lo, mid) * product(mid, hi)
+
+
+def factorial_binary_split(n):
+    validate_input(n)
+    return product(1, n + 1)
+
+
+def primes(n):
+    '''Returns: list of the primes <= n, sieve of Eratosthenes.'''
+    if n < 2:
+        return []
+    sieve = bytearray([1]) * (n + 1)
+    sieve[0] = sieve[1] = 0
+    for i in xrange(2, int(n ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytearray(len(xrange(i*i, n + 1, i)))
+    return [i for i in xrange(n + 1) if sieve[i]]
+
+
+def _product_list(values, lo, hi):
+    '''product of values[lo:hi], by binary splitting.'''
+    if hi - lo <= 8:
+        res = 1
+        for val in values[lo:hi]:
+            res *= val
+        return res
+    mid = (lo + hi) // 2
+    return _product_list(values, lo, mid) * _product_list(values, mid, hi)
+
+
+def factorial_prime_swing(n):
+    '''
+    n! = (n/2)!**2 * swing(n), where swing(n) = n! / (n/2)!**2.
+    swing(n) is the product of the primes p <= n, each one to the power
+    of the number of odd values in n/p, n/p**2, ...
+    so it is computed from the primes, without multiplying all integers.
+    '''
+    validate_input(n)
+    prime_list = primes(n)
+    # n, n/2, n/4, ... down to 1, computed from the smallest
+    ns = []
+    while n > 1:
+        ns.append(n)
+        n //= 2
+    res = 1
+    for m in reversed(ns):
+        factors = []
+        for p in prime_list:
+            if p > m:
+                break
+            power = 1
+            q = m
+            while q >= p:
+                q //= p
+                if q & 1:
+                    power *= p
+            if power > 1:
+                factors.append(power)
+        res = res * res * _product_list(factors, 0, len(factors))
+    return res
+
+
+CHECKPOINT_STEP = 1000
+CHECKPOINT_MAXSIZE = 32
+_checkpoints = OrderedDict()    # k -> k!, for some multiples k of the step
+
+
+def factorial_cached(n):
+    '''
+    factorial starting from the closest checkpoint below n:
+    the factorials of multiples of CHECKPOINT_STEP are kept, at most
+    CHECKPOINT_MAXSIZE of them, the least recently used being dropped.
+    '''
+    validate_input(n)
+    checkpoint = n - n % CHECKPOINT_STEP
+    res = _checkpoints.pop(checkpoint, None)
+    if res is None:
+        below = [k for k in _checkpoints if k < checkpoint]
+        start = max(below) if below else 0
+        res = 1
+        if below:
+            # used again: most recent at the end
+            res = _checkpoints.pop(start)
+            _checkpoints[start] = res
+        res *= product(start + 1, checkpoint + 1)
+    _checkpoints[checkpoint] = res  # most recent at the end
+    if len(_checkpoints) > CHECKPOINT_MAXSIZE:
+        _checkpoints.popitem(last=False)
+    return res * product(checkpoint + 1, n + 1)
+
+
+class FactorialTestCase( unittest.TestCase ):
+
+    functions = [factorial_iterative, factorial_recursive,
+                 factorial_binary_split, factorial_prime_swing,
+                 factorial_cached]
+
+    # the module, not globals(): __main__ when run as a script
+    module = sys.modules[__name__]
+
+    def setUp(self):
+        self.maxsize = self.module.CHECKPOINT_MAXSIZE
+        _checkpoints.clear()
+
+    def tearDown(self):
+        self.module.CHECKPOINT_MAXSIZE = self.maxsize
+        _checkpoints.clear()
+
+    def test_small(self):
+        for function in self.functions:
+            for n in range(30):
+                self.assertEqual(function(n), math.factorial(n))
+
+    def test_large(self):
+        for n in [999, 1000, 1001, 2500, 4321]:
+            expected = math.factorial(n)
+            self.assertEqual(factorial_binary_split(n), expected)
+            self.assertEqual(factorial_prime_swing(n), expected)
+            self.assertEqual(factorial_cached(n), expected)
+        self.assertEqual(sorted(_checkpoints), [0, 1000, 2000, 4000])
+
+    def test_invalid(self):
+        for function in self.functions:
+            self.assertRaises(ValueError, function, -1)
+            self.assertRaises(ValueError, function, 1.5)
+
+    def test_checkpoints_lru(self):
+        # the checkpoint used as a start is the most recent one
+        factorial_cached(1000)
+        factorial_cached(5000)
+        factorial_cached(3000)
+        self.assertEqual(_checkpoints.keys(), [5000, 1000, 3000])
+        self.module.CHECKPOINT_MAXSIZE = 3
+        factorial_cached(7000)
+        # starts from 5000: 1000 is dropped
+        self.assertEqual(_checkpoints.keys(), [3000, 5000, 7000])
+
+    def test_primes(self):
+        self.assertEqual(primes(1), [])
+        self.assertEqual(primes(30), [2, 3, 5, 7, 11, 13, 17, 19, 23, 29])
+
+
+def benchmark(nmax=10**6):
+    '''prints the time taken by the factorial functions,
+    for n = 1000, 10000, ... nmax.
+    factorial_iterative is quadratic: it is stopped at 10**5.
+    factorial_recursive is limited by the recursion depth.'''
+    n = 1000
+    while n <= nmax:
+        print 'n =', n
+        expected = None
+        for name, function in [
+                ('factorial_iterative', factorial_iterative),
+                ('factorial_binary_split', factorial_binary_split),
+                ('factorial_prime_swing', factorial_prime_swing),
+                ('factorial_cached', factorial_cached),
+                ('factorial_cached, again', factorial_cached),
+                ('factorial_cached, n+1',
+                 lambda n: factorial_cached(n + 1) // (n + 1))]:
+            if function is factorial_iterative and n > 10**5:
+                continue
+            start = time.time()
+            res = function(n)
+            print '  {0:25} {1:8.3f} s'.format(name, time.time() - start)
+            if expected is None:
+                expected = res
+            assert res == expected
+        n *= 10
+
+
 if __name__ == '__main__':
 
-    test_values = [0, 1, 2, 3]
-    for val in test_values:
-        print '{val}! = {res1} {res2}'.format(
-            val = val,
-            res1 = factorial_iterative(val),
-            res2 = factorial_recursive(val) )
-
-    print 'the following should fail'
-    try: 
-        factorial_recursive(1.5)
-    except ValueError as err:
-        print err
-    try:
-        factorial_recursive(-1)
-    except ValueError as err:
-        print err
+    if len(sys.argv) > 1:
+        # python factorial.py 1000000
+        benchmark(int(sys.argv[1]))
+    else:
+        test_values = [0, 1, 2, 3, 10, 20]
+        for val in test_values:
+            print '{val}! = {res1} {res2} {res3} {res4} {res5}'.format(
+                val = val,
+                res1 = factorial_iterative(val),
+                res2 = factorial_recursive(val),
+                res3 = factorial_binary_split(val),
+                res4 = factorial_prime_swing(val),
+                res5 = factorial_cached(val) )
+
+        print 'the following should fail'
+        try: 
+            factorial_recursive(1.5)
+        except ValueError as err:
+            print err
+        try:
+            factorial_recursive(-1)
+        except ValueError as err:
+            print err
+
+        unittest.main()
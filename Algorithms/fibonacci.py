@@ -1,3 +1,9 @@
+import sys
+import time
+import unittest
+import numpy as np
+from collections import OrderedDict
+
 
 def fibonacci_recursive_1(n, val=1, pre=0, level=2):
     ''' n >= 0
@@ -62,13 +68,195 @@ def fibonacci_iterative(n):
             i+=1
         return val
 
-        
-if __name__ == '__main__':
 
-    fibo = [0, 1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89]
+def fibonacci_pair(n):
+    '''
+    Returns: F(n), F(n+1), by fast doubling, in O(log n) multiplications:
 
-    print 'n\ttrue\tpred'
-    for i, val in enumerate(fibo):
-        print i, '\t', val, '\t', fibonacci_iterative(i)
+    F(2k)   = F(k) * (2*F(k+1) - F(k))
+    F(2k+1) = F(k)**2 + F(k+1)**2
 
-    
+    the bits of n are read from the highest one: each bit doubles k,
+    and a 1 bit adds one step.
+    '''
+    if n<0:
+        raise ValueError('n must be >= 0.')
+    pre, val = 0, 1     # F(k), F(k+1), starting at k=0
+    for bit in bin(n)[2:]:
+        pre, val = pre * (2*val - pre), pre*pre + val*val
+        if bit == '1':
+            pre, val = val, pre + val
+    return pre, val
+
+
+class LRUCache(object):
+    '''dict keeping the maxsize most recently used keys.'''
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self.data.pop(key)
+        except KeyError:
+            return default
+        self.data[key] = value  # most recent at the end
+        return value
+
+    def __setitem__(self, key, value):
+        self.data.pop(key, None)
+        self.data[key] = value
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+
+_memo = LRUCache(128)   # n -> F(n), F(n+1)
+
+
+def fibonacci_fast(n):
+    '''
+    fast doubling, remembering the last indices computed.
+    for n in the millions, the iterative version takes tens of seconds,
+    this one a tenth of a second: most of the time is spent in the
+    multiplications of numbers with hundreds of thousands of digits.
+    '''
+    pair = _memo.get(n)
+    if pair is None:
+        pair = fibonacci_pair(n)
+        _memo[n] = pair
+    return pair[0]
+
+
+def fibonacci_many(ns):
+    '''
+    Returns: list of F(n) for each n in ns.
+
+    the indices are sorted, and each F(n) is obtained from the previous
+    one, k = n - d, with the addition formulas:
+
+    F(k+d)   = F(k) * (F(d+1) - F(d)) + F(k+1) * F(d)
+    F(k+d+1) = F(k) * F(d) + F(k+1) * F(d+1)
+
+    when the indices are close, F(d) is small, and the multiplications
+    are much cheaper than starting again from 0.
+    '''
+    results = dict()
+    pre, val = 0, 1     # F(k), F(k+1)
+    k = 0
+    for n in sorted(set(ns)):
+        if n<0:
+            raise ValueError('n must be >= 0.')
+        fd, fd1 = fibonacci_pair(n - k)
+        pre, val = pre * (fd1 - fd) + val * fd, pre * fd + val * fd1
+        k = n
+        results[n] = pre
+    return [results[n] for n in ns]
+
+
+def fibonacci_mod(ns, m):
+    '''
+    Returns: numpy array of F(n) mod m, for each n of the array ns.
+
+    fast doubling on all n at once. the leading 0 bits of a small n keep
+    F(0), F(1) unchanged, so all n can go through the bits of the largest.
+    all values are below m, and m < 2**31, so that the products fit
+    in int64.
+    '''
+    if not 0 < m < 2**31:
+        raise ValueError('m must be in [1, 2**31[.')
+    ns = np.asarray(ns, dtype=np.int64)
+    if ns.size and ns.min() < 0:
+        raise ValueError('n must be >= 0.')
+    pre = np.zeros(ns.shape, dtype=np.int64)
+    val = np.ones(ns.shape, dtype=np.int64) % m
+    nbits = int(ns.max()).bit_length() if ns.size else 0
+    for shift in reversed(range(nbits)):
+        pre, val = (pre * ((2*val - pre) % m) % m,
+                    (pre*pre + val*val) % m)
+        bit = (ns >> shift) & 1 == 1
+        pre, val = np.where(bit, val, pre), np.where(bit, (pre + val) % m, val)
+    return pre
+
+
+class FibonacciTestCase( unittest.TestCase ):
+
+    def setUp(self):
+        self.expected = [fibonacci_iterative(n) for n in range(300)]
+
+    def test_small(self):
+        self.assertEqual(self.expected[:12],
+                         [0, 1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89])
+        for n in range(20):
+            self.assertEqual(fibonacci_recursive_1(n), self.expected[n])
+            self.assertEqual(fibonacci_recursive_2(n), self.expected[n])
+
+    def test_pair(self):
+        for n in range(299):
+            self.assertEqual(fibonacci_pair(n),
+                             (self.expected[n], self.expected[n+1]))
+        self.assertRaises(ValueError, fibonacci_pair, -1)
+
+    def test_fast(self):
+        for n in range(300) + range(300):
+            self.assertEqual(fibonacci_fast(n), self.expected[n])
+        self.assertLessEqual(len(_memo), _memo.maxsize)
+        self.assertEqual(fibonacci_fast(5000), fibonacci_iterative(5000))
+        self.assertRaises(ValueError, fibonacci_fast, -1)
+
+    def test_lru(self):
+        cache = LRUCache(2)
+        cache[1] = 'a'
+        cache[2] = 'b'
+        self.assertEqual(cache.get(1), 'a')
+        cache[3] = 'c'
+        self.assertEqual(cache.get(2), None)
+        self.assertEqual(cache.get(1), 'a')
+        self.assertEqual(len(cache), 2)
+
+    def test_many(self):
+        ns = [5, 0, 299, 17, 5, 1, 150]
+        self.assertEqual(fibonacci_many(ns), [self.expected[n] for n in ns])
+        self.assertEqual(fibonacci_many([]), [])
+        self.assertEqual(fibonacci_many([0]), [0])
+        self.assertRaises(ValueError, fibonacci_many, [3, -1])
+
+    def test_mod(self):
+        ns = range(300)
+        for m in [1, 2, 10, 1000000007, 2**31 - 1]:
+            self.assertEqual(fibonacci_mod(ns, m).tolist(),
+                             [value % m for value in self.expected])
+        self.assertEqual(fibonacci_mod([0], 10).tolist(), [0])
+        self.assertEqual(fibonacci_mod([], 10).tolist(), [])
+        self.assertRaises(ValueError, fibonacci_mod, [1], 0)
+        self.assertRaises(ValueError, fibonacci_mod, [1], 2**31)
+        self.assertRaises(ValueError, fibonacci_mod, [-1], 10)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        # python fibonacci.py 200000
+        n = int(sys.argv[1])
+        for function in [fibonacci_iterative, fibonacci_fast]:
+            start = time.time()
+            value = function(n)
+            print '{0:20} n={1} {2:.3f} s'.format(function.__name__, n,
+                                                 time.time() - start)
+
+        ns = range(5 * n, 5 * n + 100)
+        start = time.time()
+        values = [fibonacci_pair(n)[0] for n in ns]
+        print 'fibonacci_pair x 100   {0:.3f} s'.format(time.time() - start)
+        start = time.time()
+        assert fibonacci_many(ns) == values
+        print 'fibonacci_many         {0:.3f} s'.format(time.time() - start)
+        start = time.time()
+        mod = fibonacci_mod(ns, 1000000007)
+        assert mod.tolist() == [value % 1000000007 for value in values]
+        print 'fibonacci_mod          {0:.3f} s'.format(time.time() - start)
+    else:
+        unittest.main()
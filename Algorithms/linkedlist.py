@@ -1,6 +1,14 @@
+import sys
+import unittest
+from array import array
+
 
 class Node(object):
 
+    # no __dict__ per node: a list of a million nodes takes a fraction
+    # of the memory
+    __slots__ = ('child', 'value')
+
     def __init__(self, value):
         self.child = None
         self.value = value
@@ -21,7 +29,7 @@ def iterate(node):
 def build_list(N=10):
     parent = None
     root = None
-    for i in range(N):
+    for i in xrange(N):
         node = Node(i)
         if parent:
             parent.child = node
@@ -37,11 +45,173 @@ def print_list(root):
         root = root.child
 
 
+# no node, like None for Node
+NIL = -1
+
+
+class ArrayList(object):
+    '''
+    Linked lists allocated in a pool of nodes stored in arrays: node i has
+    the value values[i], and the child children[i], NIL for no child.
+    A node is an int, so that a node takes a few bytes instead of an
+    object, and the nodes of several lists can share the same pool.
+
+    typecode: of the array of the values, e.g. 'l', or None to store
+    any python value in a list.
+
+    The freed nodes are chained through their children, and reused
+    by new_node.
+    '''
+
+    def __init__(self, typecode=None):
+        self.values = array(typecode) if typecode else []
+        self.children = array('l')
+        self.free_head = NIL
+
+    def new_node(self, value, child=NIL):
+        '''Returns: a new node.'''
+        i = self.free_head
+        if i == NIL:
+            i = len(self.children)
+            self.values.append(value)
+            self.children.append(child)
+        else:
+            self.free_head = self.children[i]
+            self.values[i] = value
+            self.children[i] = child
+        return i
+
+    def free(self, root):
+        '''gives the nodes of the list starting at root back to the pool.'''
+        children = self.children
+        # releasing the python values
+        values = self.values if isinstance(self.values, list) else None
+        node = root
+        while node != NIL:
+            child = children[node]
+            if values is not None:
+                values[node] = None
+            children[node] = self.free_head
+            self.free_head = node
+            node = child
+
+    def build_list(self, values):
+        '''Returns: first node of a new list of values.'''
+        children = self.children
+        root = parent = NIL
+        for value in values:
+            node = self.new_node(value)
+            if parent == NIL:
+                root = node
+            else:
+                children[parent] = node
+            parent = node
+        return root
+
+    def iterate(self, node):
+        '''Yields: the nodes of the list starting at node.'''
+        children = self.children
+        while node != NIL:
+            yield node
+            node = children[node]
+
+    def to_list(self, root):
+        '''Returns: python list of the values of the list.'''
+        values = self.values
+        return [values[node] for node in self.iterate(root)]
+
+    def reverse(self, root):
+        '''reverses the list in place.
+        Returns: the new first node.'''
+        children = self.children
+        parent = NIL
+        node = root
+        while node != NIL:
+            child = children[node]
+            children[node] = parent
+            parent = node
+            node = child
+        return parent
+
+    def nth_to_last(self, root, n):
+        '''Returns: the n-th node before the last one, the last one for
+        n = 0, NIL if the list is shorter.'''
+        children = self.children
+        lead = root
+        for i in xrange(n):
+            if lead == NIL:
+                return NIL
+            lead = children[lead]
+        if lead == NIL:
+            return NIL
+        node = root
+        while children[lead] != NIL:
+            lead = children[lead]
+            node = children[node]
+        return node
+
+
+class LinkedListTestCase( unittest.TestCase ):
+
+    def test_build(self):
+        root = build_list(5)
+        self.assertEqual([node.value for node in iterate(root)], range(5))
+        self.assertEqual(build_list(0), None)
+        self.assertFalse(hasattr(root, '__dict__'))
+
+
+class ArrayListTestCase( unittest.TestCase ):
+
+    def test_reverse(self):
+        for typecode in [None, 'l']:
+            pool = ArrayList(typecode)
+            root = pool.build_list(range(5))
+            root = pool.reverse(root)
+            self.assertEqual(pool.to_list(root), [4, 3, 2, 1, 0])
+            self.assertEqual(pool.reverse(NIL), NIL)
+            root = pool.build_list([7])
+            self.assertEqual(pool.to_list(pool.reverse(root)), [7])
+
+    def test_free(self):
+        pool = ArrayList()
+        first = pool.build_list(['a', 'b', 'c'])
+        second = pool.build_list(['d'])
+        pool.free(first)
+        # the python values are released
+        self.assertEqual(pool.values, [None, None, None, 'd'])
+        # the freed nodes are reused, the other list is unchanged
+        third = pool.build_list(['e', 'f'])
+        self.assertEqual(len(pool.children), 4)
+        self.assertEqual(pool.to_list(third), ['e', 'f'])
+        self.assertEqual(pool.to_list(second), ['d'])
+        pool.build_list(['g', 'h'])
+        self.assertEqual(len(pool.children), 5)
+        pool.free(NIL)
+
+    def test_nth_to_last(self):
+        pool = ArrayList('l')
+        root = pool.build_list(range(5))
+        values = pool.values
+        self.assertEqual(values[pool.nth_to_last(root, 0)], 4)
+        self.assertEqual(values[pool.nth_to_last(root, 4)], 0)
+        self.assertEqual(pool.nth_to_last(root, 5), NIL)
+        self.assertEqual(pool.nth_to_last(root, 6), NIL)
+        self.assertEqual(pool.nth_to_last(NIL, 0), NIL)
+
+
 if __name__ == '__main__':
 
-    import pprint
-    root = build_list()
-    print_list(root)
+    if len(sys.argv) > 1:
+        # python linkedlist.py demo
+        root = build_list()
+        print_list(root)
+
+        for node in iterate(root):
+            print node
 
-    for node in iterate(root):
-        print node
+        pool = ArrayList('l')
+        root = pool.build_list(xrange(10))
+        root = pool.reverse(root)
+        print pool.to_list(root), pool.values[pool.nth_to_last(root, 2)]
+    else:
+        unittest.main()
@@ -1,7 +1,11 @@
 
+import sys
+import unittest
 from linkedlist import Node, build_list
 
 def look_ahead(node, n_to_last, thenode):
+    '''recursive: reaches the recursion limit for lists
+    longer than ~1000 nodes. see nth_to_last.'''
     if thenode[0]:
         return -1
     n_ahead = 0
@@ -14,6 +18,45 @@ def look_ahead(node, n_to_last, thenode):
     return n_ahead+1
 
 
+def nth_to_last(root, n_to_last):
+    '''Returns: the n_to_last-th node before the last one, the last one
+    for n_to_last = 0, or None if the list is shorter.
+
+    two pointers: lead goes n_to_last nodes ahead, then both go to the
+    end of the list together. O(1) memory, one pass.'''
+    lead = root
+    for i in xrange(n_to_last):
+        if lead is None:
+            return None
+        lead = lead.child
+    if lead is None:
+        return None
+    node = root
+    while lead.child is not None:
+        lead = lead.child
+        node = node.child
+    return node
+
+class NthToLastTestCase( unittest.TestCase ):
+
+    def test_nth_to_last(self):
+        root = build_list(5)
+        self.assertEqual(nth_to_last(root, 0).value, 4)
+        self.assertEqual(nth_to_last(root, 4).value, 0)
+        self.assertEqual(nth_to_last(root, 5), None)
+        self.assertEqual(nth_to_last(root, 6), None)
+        self.assertEqual(nth_to_last(None, 0), None)
+        for n in range(5):
+            thenode = [None]
+            look_ahead(root, n, thenode)
+            self.assertIs(nth_to_last(root, n), thenode[0])
+
+    def test_long_list(self):
+        # no recursion
+        root = build_list(100000)
+        self.assertEqual(nth_to_last(root, 10).value, 99989)
+
+
 if __name__ == '__main__':
 
     import pprint 
@@ -22,6 +65,14 @@ if __name__ == '__main__':
     thenode = [None]
     look_ahead(root, 2, thenode)
     print thenode[0]
+    print nth_to_last(root, 2)
+
+    if len(sys.argv) > 1:
+        # python nth_to_last_in_list.py 1000000
+        root = build_list(int(sys.argv[1]))
+        print nth_to_last(root, 2)
+    else:
+        unittest.main()
 
 
 
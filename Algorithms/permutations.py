@@ -1,4 +1,10 @@
+import sys
 import copy
+import time
+import unittest
+import itertools
+from math import factorial
+from multiprocessing import Pool
 
 
 def permutations_1( perms,
@@ -42,9 +48,11 @@ def permutations_2( perms,
         used = [False] * len(elements)
         level = 0
     level += 1 
-    if level == len(elements):
-        # all elements used
-        perms.append( current_perm )
+    if level > len(elements):
+        # all elements used. current_perm is modified by the other
+        # frames, so a copy is kept
+        perms.append( tuple(current_perm) )
+        return
     for i, item in enumerate( elements ):
         if used[i]:
             continue
@@ -62,13 +70,194 @@ def permutations_2( perms,
         used[i] = False
 
 
+def permutations_lexicographic(elements, start=0, stop=None):
+    '''
+    Yields: the permutations of elements, as tuples, in lexicographic order
+    of the positions of the elements, one at a time, without keeping them.
+    The elements do not need to be comparable, nor distinct.
+
+    start, stop: ranks of the first permutation, and of the one after the
+    last, so that a range can be enumerated without the ones before.
+
+    the next permutation is found in place, in O(n) for the worst case
+    but O(1) on average:
+    - find the last position i such that idx[i] < idx[i+1].
+      idx[i+1:] is decreasing: it is the last permutation of these
+      positions, and idx[i] has to be increased.
+    - swap idx[i] with the smallest value larger than it in idx[i+1:],
+      which is the last one larger than it.
+    - reverse idx[i+1:], which is then increasing: the first permutation
+      of these positions.
+    '''
+    elements = list(elements)
+    n = len(elements)
+    if stop is None:
+        stop = factorial(n)
+    if start >= stop:
+        return
+    idx = list(unrank(start, range(n)))
+    for count in xrange(stop - start):
+        yield tuple([elements[j] for j in idx])
+        i = n - 2
+        while i >= 0 and idx[i] > idx[i+1]:
+            i -= 1
+        if i < 0:
+            # last permutation
+            return
+        j = n - 1
+        while idx[j] < idx[i]:
+            j -= 1
+        idx[i], idx[j] = idx[j], idx[i]
+        idx[i+1:] = idx[:i:-1]
+
+
+def rank(perm, elements=None):
+    '''
+    Returns: the rank of perm in the lexicographic order of the
+    permutations of elements, sorted(perm) by default.
+
+    the Lehmer code: for each position, the number of elements not used
+    yet that come before the current one, times the number of permutations
+    of the positions after it.
+    '''
+    if elements is None:
+        elements = sorted(perm)
+    remaining = list(elements)
+    res = 0
+    n = len(remaining)
+    for position, item in enumerate(perm):
+        digit = remaining.index(item)
+        del remaining[digit]
+        res += digit * factorial(n - position - 1)
+    return res
+
+
+def unrank(k, elements):
+    '''
+    Returns: the permutation of elements with rank k, as a tuple.
+    inverse of rank: k is decomposed in the factorial number system.
+    '''
+    remaining = list(elements)
+    n = len(remaining)
+    if not 0 <= k < factorial(n):
+        raise ValueError('k must be in [0, {n}!['.format(n=n))
+    perm = []
+    for position in range(n):
+        digit, k = divmod(k, factorial(n - position - 1))
+        perm.append(remaining.pop(digit))
+    return tuple(perm)
+
+
+def shard(elements, i, nshards):
+    '''
+    Yields: the permutations of shard i, out of nshards.
+    the shards are consecutive ranges of ranks, of nearly the same size,
+    so that nshards processes can enumerate all permutations in parallel,
+    each one starting directly at its first permutation.
+    '''
+    if not 0 <= i < nshards:
+        raise ValueError('i must be in [0, nshards[')
+    elements = list(elements)
+    total = factorial(len(elements))
+    return permutations_lexicographic(elements, total * i // nshards,
+                                      total * (i + 1) // nshards)
+
+
+def _count_shard(args):
+    '''Returns: number of permutations in a shard starting with
+    their smallest element, run in the pool of the example below.'''
+    elements, i, nshards = args
+    first = min(elements)
+    return sum(1 for perm in shard(elements, i, nshards) if perm[0] == first)
+
+
+
+class PermutationsTestCase( unittest.TestCase ):
+
+    def test_permutations(self):
+        elements = list('abcd')
+        expected = list(itertools.permutations(elements))
+        perms = []
+        permutations_1(perms, elements)
+        self.assertEqual(sorted(tuple(perm) for perm in perms), expected)
+        perms = []
+        permutations_2(perms, elements)
+        self.assertEqual(sorted(perms), expected)
+
+    def test_lexicographic(self):
+        for n in range(6):
+            elements = list('abcdef'[:n])
+            self.assertEqual(list(permutations_lexicographic(elements)),
+                             list(itertools.permutations(elements)))
+        # same order as itertools, by position, with repeated elements too
+        self.assertEqual(list(permutations_lexicographic('aab')),
+                         list(itertools.permutations('aab')))
+        self.assertEqual(list(permutations_lexicographic(range(4), 5, 8)),
+                         list(itertools.permutations(range(4)))[5:8])
+        self.assertEqual(list(permutations_lexicographic(range(4), 3, 3)), [])
+
+    def test_rank(self):
+        elements = list('abcde')
+        for k, perm in enumerate(itertools.permutations(elements)):
+            self.assertEqual(rank(perm), k)
+            self.assertEqual(rank(perm, elements), k)
+            self.assertEqual(unrank(k, elements), perm)
+        self.assertEqual(rank(()), 0)
+        self.assertEqual(unrank(0, []), ())
+        self.assertRaises(ValueError, unrank, 120, elements)
+        self.assertRaises(ValueError, unrank, -1, elements)
+        # rank in the order of elements, not of the sorted elements
+        self.assertEqual(rank((2, 1, 0), [2, 1, 0]), 0)
+
+    def test_shard(self):
+        elements = range(5)
+        expected = list(itertools.permutations(elements))
+        for nshards in [1, 3, 7, 120, 200]:
+            shards = [list(shard(elements, i, nshards))
+                      for i in range(nshards)]
+            self.assertEqual(sum(shards, []), expected)
+            sizes = [len(perms) for perms in shards]
+            self.assertLessEqual(max(sizes) - min(sizes), 1)
+        self.assertRaises(ValueError, shard, elements, 3, 3)
+        self.assertEqual(_count_shard((elements, 0, 1)), 24)
+
 
 if __name__ == '__main__':
-    iterable = list( 'colinsdaf' )
-    words = []
-    permutations_1( words, iterable )
-    print len(words)
-#    print [''.join(word) for word in words]
+
+    if len(sys.argv) > 1:
+        # python permutations.py 10
+        iterable = list( 'colinsdaf' )
+        words = []
+        permutations_1( words, iterable )
+        print len(words)
+    #    print [''.join(word) for word in words]
+
+        words = []
+        permutations_2( words, iterable )
+        assert sorted(words) == sorted(itertools.permutations(iterable))
+        print len(words)
+
+        # generator: the permutations are not kept in memory
+        elements = range(int(sys.argv[1]))
+        start = time.time()
+        count = 0
+        for perm in permutations_lexicographic(elements):
+            count += 1
+        print count, 'permutations of {0} elements in {1:.2f} s'.format(
+            len(elements), time.time() - start)
+        print rank((3, 1, 2, 0)), unrank(rank((3, 1, 2, 0)), range(4))
+
+        # sharding the enumeration over a pool of processes
+        nshards = 8
+        pool = Pool()
+        start = time.time()
+        counts = pool.map(_count_shard, [(elements, i, nshards)
+                                         for i in range(nshards)])
+        pool.close()
+        print sum(counts), 'permutations starting with 0 in {0:.2f} s'.format(
+            time.time() - start)
+    else:
+        unittest.main()
 
 
 # In [6]: %timeit permutations_1( words, list('colinbern') )
@@ -23,7 +23,7 @@ Undirectedlink (connected)
 By providing additional visitors, the user can change the order of the graph
 traversal, or change the implementation of a given graph traversal algorithm 
 for better performance. In this module, there are several implementations.
-
+'''
 
 
 class Node(object):
@@ -40,7 +40,9 @@ class Node(object):
         self.children = []
         self.parents = []
         self.undirectedlinks =  [] # other implementations possible
-        self.visited = False #required for undirected searches     
+        # no visited flag: each traversal keeps its own set of visited
+        # nodes, so that traversals can be repeated without resetting
+        # the nodes, or run at the same time in several threads.
       
     def visit(self):
         return self.value
@@ -56,11 +58,11 @@ class Node(object):
         self.undirectedlinks.append(parent)
         
     def get_linked_nodes(self, type):  #ask colin, I imagine there is a more elegant Python way to do this
-        if (type is "children"):
+        if type == "children":
             return self.children
-        if(type is "parents"):
+        if type == "parents":
             return self.parents
-        if(type is "undirected"):
+        if type == "undirected":
             return self.undirectedlinks
         
 
@@ -72,78 +74,98 @@ class Node(object):
             ) )
 
     
+def all_nodes(nodes):
+    '''Returns: list of nodes, followed by the other nodes connected to them,
+    e.g. all the nodes of a polytree from its roots.'''
+    nodes = list(nodes)
+    known = set(nodes)
+    i = 0
+    while i < len(nodes):
+        for node in nodes[i].undirectedlinks:
+            if node not in known:
+                known.add(node)
+                nodes.append(node)
+        i += 1
+    return nodes
+
+    
 def bfs_children_recursive(nodes, result):
     '''pre-order, recursive implementation
     each recursion is one level down the tree'''
-    bfs_base_recursive(nodes, result,"children")
+    bfs_recursive(nodes, result,"children")
     
 
 def bfs_parents_recursive(nodes, result):
     '''pre-order, recursive implementation
     each recursion is one level down the tree'''
-    bfs_base_recursive(nodes, result,"parents")
+    bfs_recursive(nodes, result,"parents")
  
        
-def bfs_recursive(nodes,result, linktype ):
+def bfs_recursive(nodes,result, linktype, visited=None ):
     '''pre-order, recursive implementation
     each recursion is one level down the tree
-    linktype can be "children", "parents","undirected" '''
+    linktype can be "children", "parents","undirected"
+    visited is the set of nodes already visited by this traversal'''
+    if visited is None:
+        visited = set()
     linknodes=[]
     if len(nodes) is 0:
         return 
     for node in nodes:
-        if not node.visited:
+        if node not in visited:
+            visited.add(node)
             result.append( node.visit() )
-    for node in nodes:
-        if not node.visited:
             linknodes.extend(node.get_linked_nodes(linktype))
-            node.visited=True
-    bfs_recursive(linknodes, result, linktype)
+    bfs_recursive(linknodes, result, linktype, visited)
     
 
 def bfs_iterative(nodes, result,linktype):
     '''breadth first iterative implementation
      each iteration is one level down the tree
      linktype can be "children", "parents","undirected" 
-     visited flag is used for "undirected" '''    
+     the visited set is owned by the traversal, not by the nodes '''    
+    visited = set()
     linknodes=[]
     while len(nodes):
         for node in nodes:
-            if not node.visited:
+            if node not in visited:
+                visited.add(node)
                 result.append( node.visit() )
-                
-        for node in nodes:
-            if not node.visited:
-                node.visited=True
                 linknodes.extend(node.get_linked_nodes(linktype))
         nodes=linknodes
         linknodes=[]
 
     
-def dfs_recursive(root, result, linktype):
+def dfs_recursive(root, result, linktype, visited=None):
     '''depth first search recursive implementation
-    each recursion is one level down the tree'''
+    each recursion is one level down the tree
+    visited is the set of nodes already visited by this traversal'''
     if root is None:
         return 
+    if visited is None:
+        visited = set()
     result.append( root.visit() )
-    root.visited=True
+    visited.add(root)
     for node in root.get_linked_nodes(linktype):
-        if (not node.visited): 
-            dfs_recursive(node, result, linktype)
+        if node not in visited: 
+            dfs_recursive(node, result, linktype, visited)
         
 
 def dfs_iterative(root, result, linktype):
     '''depth first search iterative implementation
         in same order as for recursion
-     visited flag is used for "undirected" '''    
+     the visited set is owned by the traversal, not by the nodes '''    
+    visited = set()
     todo = Stack()
     todo.append(root)
     while len(todo):
         node = todo.pop()
+        if node in visited: # pushed by several linked nodes
+            continue
         result.append(node.visit())
-        node.visited=True;
+        visited.add(node)
         for node in reversed(node.get_linked_nodes(linktype)): #reversal makes it match dfs_recursive
-            if (not node.visited):            
+            if node not in visited:            
                 todo.append(node)
         
 
@@ -151,14 +173,17 @@ def dfs_iterative_2(root, result,linktype):
     '''depth first search iterative implementation
         children are traversed in a different order to previous algorithms (but its more efficient)
         ''' 
+    visited = set()
     todo = Stack()
     todo.append(root)
     while len(todo):
         node = todo.pop()
+        if node in visited:
+            continue
         result.append(node.visit())
-        node.visited=True;
+        visited.add(node)
         for node in node.get_linked_nodes(linktype):
-            if (not node.visited):     
+            if node not in visited:     
                 todo.append(node)
 
 
@@ -210,9 +235,9 @@ class TreeTestCase( unittest.TestCase ):
         # the result is equal to [0, 1, 2, 3, 4, 5, 6, 7]
         self.assertEqual(result, range(8) )        
     
-    def test_bfs_recursive(self):
+    def test_bfs_children_recursive(self):
         result = []
-        bfs_recursive( [self.nodes[0]], result,"children" )
+        bfs_children_recursive( [self.nodes[0]], result )
         # the result is equal to [0, 1, 2, 3, 4, 5, 6, 7]
         self.assertEqual(result, range(8) )           
 
@@ -245,5 +270,46 @@ class TreeTestCase( unittest.TestCase ):
         dfs_iterative_2( self.nodes[4], result, "parents" )
         # the result is equal to  #for this algoritm more "natural" to do children "backwards"
         self.assertEqual(result, [4, 9, 8,  1, 0])
+
+    def test_repeated(self):
+        # no reset of the nodes between two traversals
+        for i in range(2):
+            result = []
+            dfs_iterative( self.nodes[4], result, "undirected")
+            self.assertEqual(result, [4, 1, 0, 2, 3, 5, 7, 6, 9, 8])
+            result = []
+            bfs_recursive( [self.nodes[1]], result, "undirected")
+            self.assertEqual(result, [1, 0, 4, 5, 6, 2, 3, 9, 7, 8] )
+
+    def test_several_parents(self):
+        # 6 has two parents, 1 and 3, and is visited once
+        self.set_link(self.nodes[3],self.nodes[6])
+        for traversal in [dfs_recursive, dfs_iterative, dfs_iterative_2]:
+            result = []
+            traversal( self.nodes[0], result, "children")
+            self.assertEqual(sorted(result), range(8))
+        result = []
+        bfs_iterative( [self.nodes[0]], result, "children")
+        self.assertEqual(result, range(8))
+
+    def test_threads(self):
+        import threading
+        results = dict()
+        def traverse(i):
+            result = []
+            for j in range(100):
+                result = []
+                dfs_iterative( self.nodes[i % 10], result, "undirected")
+            results[i] = result
+        threads = [threading.Thread(target=traverse, args=(i,))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i, result in results.iteritems():
+            self.assertEqual(sorted(result), range(10))
+            self.assertEqual(result[0], i % 10)
+
 if __name__ == '__main__':
     unittest.main()
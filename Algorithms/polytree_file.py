@@ -0,0 +1,560 @@
+import os
+import sys
+import time
+import struct
+import pickle
+import tempfile
+import unittest
+from array import array
+
+import numpy as np
+
+from polytree import Node, all_nodes, dfs_iterative, bfs_iterative
+
+'''Binary file format for PolyTree graphs, read through mmap.
+
+Pickling a graph of polytree.Node pickles a web of objects, recursively:
+it is slow, and a long chain of nodes reaches the recursion limit.
+Here, the nodes are numbered, and the file contains a table of values and
+the edges as arrays of node numbers:
+
+  header    magic 'PTRE', version, value type, number of nodes,
+            number of edges, size of the values
+  values    int64 per node, or pickled values one after the other
+  children  for each node, start of its children in the next array
+            (number of nodes + 1 uint64), then the children (uint32)
+  parents   same, for the parents
+  offsets   for pickled values only, start of each value (uint64)
+
+The children of a node are in the order of the edges, and its parents
+in the order of their ranks given with the edges, so that the traversals
+of the polytree module give the same result on the original nodes and on
+the ones read from the file.
+
+PolyTreeWriter streams the values to the file: only the edges are kept
+in memory. open_polytree maps the file with numpy.memmap, which takes
+no time: the nodes are only built when they are accessed, and the pages
+of the file are loaded by the OS on demand.
+'''
+
+MAGIC = 'PTRE'
+VERSION = 1
+INT_VALUES = 0
+PICKLED_VALUES = 1
+
+_header = struct.Struct('<4sHHQQQ')
+
+
+def _padding(size):
+    '''Returns: the number of bytes to align size on 8 bytes.'''
+    return -size % 8
+
+
+def _is_int64(value):
+    return type(value) in (int, long) and -2**63 <= value < 2**63
+
+
+class PolyTreeWriter(object):
+    '''Writes a polytree file, one node and one edge at a time.
+
+    Example:
+      with PolyTreeWriter('graph.ptree') as writer:
+          a = writer.add_node(1)
+          b = writer.add_node(2)
+          writer.add_edge(a, b)
+    '''
+
+    def __init__(self, filename, pickled=False):
+        '''pickled: False if all values are integers, stored as int64,
+        True to store any picklable values.'''
+        self.ofile = open(filename, 'wb')
+        # the magic is only written by close: a file which was not
+        # closed is not a valid polytree file
+        self.ofile.write(_header.pack('\0' * len(MAGIC), VERSION, 0, 0, 0, 0))
+        self.pickled = pickled
+        self.nnodes = 0
+        self.values = array('l')    # not written yet
+        self.offsets = array('L', [0])
+        self.parents = array('I')
+        self.children = array('I')
+        self.parent_ranks = array('I')
+
+    def add_node(self, value):
+        '''Returns: the number of the new node.'''
+        if self.pickled:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            self.ofile.write(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+        else:
+            self.values.append(value)
+            if len(self.values) >= 65536:
+                self._flush_values()
+        self.nnodes += 1
+        return self.nnodes - 1
+
+    def _flush_values(self):
+        '''Write the integer values not written yet.'''
+        values = np.frombuffer(self.values, dtype=np.dtype('l')) \
+            if len(self.values) else np.zeros(0)
+        values.astype('<i8').tofile(self.ofile)
+        del self.values[:]
+
+    def add_nodes(self, values):
+        '''Add a node for each value, e.g. from a numpy array.
+        Returns: the number of the first new node.'''
+        first = self.nnodes
+        if self.pickled:
+            for value in values:
+                self.add_node(value)
+        else:
+            self._flush_values()
+            values = np.asarray(values, dtype='<i8')
+            values.tofile(self.ofile)
+            self.nnodes += len(values)
+        return first
+
+    def add_edge(self, parent, child, parent_rank=0):
+        '''Add an edge between the nodes numbered parent and child.
+        parent_rank: position of parent in the parents of child. The
+        parents with the same rank are in the order of the edges.'''
+        self.parents.append(parent)
+        self.children.append(child)
+        self.parent_ranks.append(parent_rank)
+
+    def add_edges(self, parents, children, parent_ranks=None):
+        '''Add the edges parents[k] -> children[k], e.g. from numpy arrays.
+        Raises: ValueError for ids which are negative or >= 2**32.'''
+        for ids in [parents, children]:
+            ids = np.asarray(ids, dtype=np.int64)
+            if len(ids) and (ids.min() < 0 or ids.max() >= 2**32):
+                raise ValueError('node ids must be in [0, 2**32[')
+        parents = np.asarray(parents, dtype=np.uint32)
+        children = np.asarray(children, dtype=np.uint32)
+        if parent_ranks is None:
+            parent_ranks = np.zeros(len(parents), dtype=np.uint32)
+        parent_ranks = np.asarray(parent_ranks, dtype=np.uint32)
+        if not len(parents) == len(children) == len(parent_ranks):
+            raise ValueError('parents and children must have the same size')
+        self.parents.fromstring(parents.tostring())
+        self.children.fromstring(children.tostring())
+        self.parent_ranks.fromstring(parent_ranks.tostring())
+
+    def _write_links(self, sources, targets, ranks=None):
+        '''Write the start of the links of each node, and the links,
+        in the order of the ranks, then of the edges.'''
+        indptr = np.zeros(self.nnodes + 1, dtype='<u8')
+        np.cumsum(np.bincount(sources, minlength=self.nnodes),
+                  out=indptr[1:])
+        indptr.tofile(self.ofile)
+        if ranks is None:
+            order = np.argsort(sources, kind='mergesort')
+        else:
+            # stable
+            order = np.lexsort((ranks, sources))
+        links = targets[order].astype('<u4')
+        links.tofile(self.ofile)
+        self.ofile.write('\0' * _padding(links.nbytes))
+
+    def close(self):
+        '''Write the edges and the header, and close the file.'''
+        if self.ofile.closed:
+            return
+        parents = np.frombuffer(self.parents, dtype=np.uint32) \
+            if len(self.parents) else np.zeros(0, dtype=np.uint32)
+        children = np.frombuffer(self.children, dtype=np.uint32) \
+            if len(self.children) else np.zeros(0, dtype=np.uint32)
+        parent_ranks = np.frombuffer(self.parent_ranks, dtype=np.uint32) \
+            if len(self.parent_ranks) else np.zeros(0, dtype=np.uint32)
+        if len(parents) and max(parents.max(), children.max()) >= self.nnodes:
+            self.ofile.close()
+            raise ValueError('edge to a node which was not added')
+        self._flush_values()
+        values_size = self.ofile.tell() - _header.size
+        self.ofile.write('\0' * _padding(values_size))
+        self._write_links(parents, children)
+        self._write_links(children, parents, parent_ranks)
+        if self.pickled:
+            np.array(self.offsets, dtype='<u8').tofile(self.ofile)
+        self.ofile.seek(0)
+        self.ofile.write(_header.pack(
+            MAGIC, VERSION, PICKLED_VALUES if self.pickled else INT_VALUES,
+            self.nnodes, len(self.parents), values_size))
+        self.ofile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+def write_polytree(nodes, filename):
+    '''Write the polytree of nodes, and of the nodes connected to them,
+    to filename. The values are stored as int64 if they are all
+    integers, pickled otherwise.
+
+    Returns: the list of nodes, in the order of the file.
+    '''
+    nodes = all_nodes(nodes)
+    pickled = not all(_is_int64(node.value) for node in nodes)
+    ids = dict((node, i) for i, node in enumerate(nodes))
+    # position of each parent in the parents of its child
+    ranks = dict(((parent, child), rank) for child in nodes
+                 for rank, parent in enumerate(child.parents))
+    with PolyTreeWriter(filename, pickled) as writer:
+        for node in nodes:
+            writer.add_node(node.value)
+        for node in nodes:
+            for child in node.children:
+                writer.add_edge(ids[node], ids[child],
+                                ranks.get((node, child), 0))
+    return nodes
+
+
+def open_polytree(filename):
+    '''Returns: MappedPolyTree of a file written by PolyTreeWriter.'''
+    return MappedPolyTree(filename)
+
+
+class LazyNode(Node):
+    '''
+    polytree.Node read from a file. The linked nodes are only built
+    when children, parents or undirectedlinks are used.
+    The undirected links are the children, then the parents.
+    '''
+
+    def __init__(self, graph, id, value):
+        # not calling Node.__init__: the links are properties
+        self.graph = graph
+        self.id = id
+        self.value = value
+        self._children = None
+        self._parents = None
+        self._undirectedlinks = None
+
+    @property
+    def children(self):
+        if self._children is None:
+            self._children = self.graph.nodes(self.graph.children_ids(self.id))
+        return self._children
+
+    @property
+    def parents(self):
+        if self._parents is None:
+            self._parents = self.graph.nodes(self.graph.parents_ids(self.id))
+        return self._parents
+
+    @property
+    def undirectedlinks(self):
+        if self._undirectedlinks is None:
+            self._undirectedlinks = self.children + self.parents
+        return self._undirectedlinks
+
+
+class MappedPolyTree(object):
+    '''
+    Polytree file mapped in memory.
+    node(i) returns the LazyNode number i, always the same object,
+    so that the nodes can be used in sets and dicts.
+
+    close() releases the mapped arrays, also called at the end of a with
+    block. numpy cannot unmap them explicitly: the file is unmapped when
+    the arrays returned by the graph, e.g. by children_ids, are not used
+    anymore either.
+    '''
+
+    _arrays = ['values', 'children_indptr', 'children_indices',
+               'parents_indptr', 'parents_indices', 'offsets']
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as ifile:
+            header = ifile.read(_header.size)
+        size = os.path.getsize(filename)
+        if len(header) < _header.size:
+            magic = version = None
+        else:
+            (magic, version, self.value_type, self.nnodes, self.nedges,
+             values_size) = _header.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{0} is not a polytree file, version {1}'.format(
+                filename, VERSION))
+        nnodes = self.nnodes
+        nedges = self.nedges
+        offset = [_header.size]
+
+        def read(dtype, count):
+            '''Returns: the next array of the file.'''
+            dtype = np.dtype(dtype)
+            if count == 0:
+                return np.zeros(0, dtype=dtype)
+            if offset[0] + count * dtype.itemsize > size:
+                raise ValueError('{0} is truncated'.format(filename))
+            data = np.memmap(filename, dtype=dtype, mode='r',
+                             offset=offset[0], shape=(count,))
+            offset[0] += data.nbytes + _padding(data.nbytes)
+            return data
+
+        if self.value_type == INT_VALUES:
+            self.values = read('<i8', nnodes)
+        else:
+            self.values = read('u1', values_size)
+        self.children_indptr = read('<u8', nnodes + 1)
+        self.children_indices = read('<u4', nedges)
+        self.parents_indptr = read('<u8', nnodes + 1)
+        self.parents_indices = read('<u4', nedges)
+        self.offsets = read('<u8', nnodes + 1) \
+            if self.value_type == PICKLED_VALUES else None
+        self._nodes = dict()
+        self.closed = False
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError('the polytree file is closed')
+
+    def close(self):
+        '''Release the mapped arrays and the nodes.'''
+        for name in self._arrays:
+            setattr(self, name, None)
+        self._nodes = None
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def value(self, i):
+        '''Returns: the value of node i.'''
+        self._check_open()
+        if self.value_type == INT_VALUES:
+            return int(self.values[i])
+        start, end = self.offsets[i], self.offsets[i+1]
+        return pickle.loads(self.values[start:end].tostring())
+
+    def children_ids(self, i):
+        '''Returns: array of the numbers of the children of node i.'''
+        self._check_open()
+        return self.children_indices[
+            self.children_indptr[i]:self.children_indptr[i+1]]
+
+    def parents_ids(self, i):
+        '''Returns: array of the numbers of the parents of node i.'''
+        self._check_open()
+        return self.parents_indices[
+            self.parents_indptr[i]:self.parents_indptr[i+1]]
+
+    def roots(self):
+        '''Returns: array of the numbers of the nodes without parents.'''
+        self._check_open()
+        return np.flatnonzero(self.parents_indptr[1:] ==
+                              self.parents_indptr[:-1])
+
+    def node(self, i):
+        '''Returns: the LazyNode number i.'''
+        self._check_open()
+        i = int(i)
+        node = self._nodes.get(i)
+        if node is None:
+            node = LazyNode(self, i, self.value(i))
+            self._nodes[i] = node
+        return node
+
+    def nodes(self, ids):
+        '''Returns: the list of the LazyNodes with numbers ids.'''
+        return [self.node(i) for i in ids]
+
+    def __len__(self):
+        '''Number of nodes.'''
+        return self.nnodes
+
+
+class PolyTreeFileTestCase( unittest.TestCase ):
+
+    def setUp(self):
+        '''
+        same polytree as in polytree.TreeTestCase, 0 and 8 are roots
+        '''
+        self.nodes = dict( (i, Node(i) ) for i in range(10) )
+        for parent, child in [(0, 1), (0, 2), (0, 3), (1, 4), (1, 5),
+                              (1, 6), (5, 7), (8, 9), (9, 4)]:
+            self.nodes[parent].add_child(self.nodes[child])
+            self.nodes[child].add_parent(self.nodes[parent])
+        fd, self.filename = tempfile.mkstemp(suffix='.ptree')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_roundtrip(self):
+        nodes = write_polytree([self.nodes[0]], self.filename)
+        with open_polytree(self.filename) as graph:
+            self.assertEqual(len(graph), 10)
+            self.assertEqual(graph.value_type, INT_VALUES)
+            self.assertEqual([graph.value(i) for i in range(10)],
+                             [node.value for node in nodes])
+            self.assertEqual(sorted(graph.value(i) for i in graph.roots()),
+                             [0, 8])
+            for linktype, start in [('children', 0), ('parents', 4)]:
+                expected = []
+                dfs_iterative(self.nodes[start], expected, linktype)
+                result = []
+                dfs_iterative(graph.node(nodes.index(self.nodes[start])),
+                              result, linktype)
+                self.assertEqual(result, expected)
+            result = []
+            bfs_iterative([graph.node(0)], result, 'undirected')
+            self.assertEqual(sorted(result), range(10))
+
+    def test_parents_order(self):
+        # parents of 3 not in the order of the edges from the nodes
+        nodes = [Node(i) for i in range(4)]
+        for parent, child in [(0, 1), (0, 2), (1, 3), (2, 3)]:
+            nodes[parent].add_child(nodes[child])
+        for parent, child in [(0, 2), (2, 3), (0, 1), (1, 3)]:
+            nodes[child].add_parent(nodes[parent])
+        self.assertEqual([node.value for node in nodes[3].parents], [2, 1])
+        order = write_polytree(nodes, self.filename)
+        with open_polytree(self.filename) as graph:
+            node = graph.node(order.index(nodes[3]))
+            self.assertEqual([parent.value for parent in node.parents], [2, 1])
+            for linktype in ['parents', 'undirected']:
+                expected = []
+                dfs_iterative(nodes[3], expected, linktype)
+                result = []
+                dfs_iterative(node, result, linktype)
+                self.assertEqual(result, expected)
+                expected = []
+                bfs_iterative([nodes[3]], expected, linktype)
+                result = []
+                bfs_iterative([node], result, linktype)
+                self.assertEqual(result, expected)
+
+    def test_lazy(self):
+        write_polytree([self.nodes[0]], self.filename)
+        with open_polytree(self.filename) as graph:
+            root = graph.node(0)
+            self.assertEqual(len(graph._nodes), 1)
+            self.assertEqual([node.value for node in root.children], [1, 2, 3])
+            self.assertEqual(len(graph._nodes), 4)
+            self.assertIs(root.children[0].parents[0], root)
+
+    def test_pickled(self):
+        for i, node in self.nodes.iteritems():
+            node.value = 'node {0}'.format(i)
+        self.nodes[3].value = (3, None)
+        write_polytree([self.nodes[0]], self.filename)
+        with open_polytree(self.filename) as graph:
+            self.assertEqual(graph.value_type, PICKLED_VALUES)
+            self.assertEqual([node.value for node in graph.node(0).children],
+                             ['node 1', 'node 2', (3, None)])
+
+    def test_writer(self):
+        with PolyTreeWriter(self.filename) as writer:
+            for i in range(5000):
+                writer.add_node(i)
+                if i:
+                    writer.add_edge(i - 1, i)
+            # chain, continued in bulk
+            self.assertEqual(writer.add_nodes(range(5000, 100000)), 5000)
+            writer.add_edges(range(4999, 99999), range(5000, 100000))
+        with open_polytree(self.filename) as graph:
+            self.assertEqual(graph.nedges, 99999)
+            self.assertEqual(graph.value(75000), 75000)
+            # deep chain, no recursion
+            result = []
+            dfs_iterative(graph.node(0), result, 'children')
+            self.assertEqual(result, range(100000))
+
+    def test_bad_ids(self):
+        with PolyTreeWriter(self.filename) as writer:
+            writer.add_nodes(range(3))
+            self.assertRaises(ValueError, writer.add_edges, [0, -1], [1, 2])
+            self.assertRaises(ValueError, writer.add_edges, [0], [2**32])
+            writer.add_edges(np.array([0, 0]), np.array([1, 2]))
+        with open_polytree(self.filename) as graph:
+            self.assertEqual(graph.nedges, 2)
+
+    def test_close(self):
+        write_polytree([self.nodes[0]], self.filename)
+        with open_polytree(self.filename) as graph:
+            node = graph.node(0)
+        self.assertTrue(graph.closed)
+        self.assertIsNone(graph.children_indices)
+        self.assertRaises(ValueError, graph.node, 0)
+        self.assertRaises(ValueError, graph.value, 0)
+        self.assertRaises(ValueError, lambda: node.children)
+
+    def test_empty(self):
+        PolyTreeWriter(self.filename).close()
+        with open_polytree(self.filename) as graph:
+            self.assertEqual(len(graph), 0)
+            self.assertEqual(len(graph.roots()), 0)
+
+    def test_bad_file(self):
+        with open(self.filename, 'wb') as ofile:
+            ofile.write('not a polytree')
+        self.assertRaises(ValueError, open_polytree, self.filename)
+        writer = PolyTreeWriter(self.filename)
+        writer.add_node(0)
+        writer.add_edge(0, 1)
+        self.assertRaises(ValueError, writer.close)
+        self.assertRaises(ValueError, open_polytree, self.filename)
+        # not closed
+        writer = PolyTreeWriter(self.filename)
+        writer.add_nodes(range(10))
+        writer.ofile.flush()
+        self.assertRaises(ValueError, open_polytree, self.filename)
+        writer.close()
+        with open_polytree(self.filename) as graph:
+            self.assertEqual(len(graph), 10)
+        # truncated
+        with open(self.filename, 'r+b') as ofile:
+            ofile.truncate(_header.size + 40)
+        self.assertRaises(ValueError, open_polytree, self.filename)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        # python polytree_file.py 3000000
+        # writes and opens a random polytree of integers
+        from polytree_index import random_polytree
+        nnodes = int(sys.argv[1])
+        parents, children = random_polytree(nnodes)
+        fd, filename = tempfile.mkstemp(suffix='.ptree')
+        os.close(fd)
+        start = time.time()
+        with PolyTreeWriter(filename) as writer:
+            writer.add_nodes(np.arange(nnodes))
+            writer.add_edges(parents, children)
+        print 'written {0} nodes, {1} edges, {2:.0f} MB in {3:.2f} s'.format(
+            nnodes, len(parents), os.path.getsize(filename) / 1e6,
+            time.time() - start)
+        start = time.time()
+        with open_polytree(filename) as graph:
+            print 'opened in {0:.1f} ms'.format((time.time() - start) * 1e3)
+            start = time.time()
+            result = []
+            dfs_iterative(graph.node(nnodes // 1000), result, 'children')
+            print 'traversed {0} nodes in {1:.1f} ms'.format(
+                len(result), (time.time() - start) * 1e3)
+        os.remove(filename)
+
+        # pickle, for comparison. It follows the links recursively, and
+        # raising the recursion limit overflows the C stack instead.
+        nodes = [Node(i) for i in xrange(nnodes)]
+        for parent, child in zip(parents.tolist(), children.tolist()):
+            nodes[parent].add_child(nodes[child])
+            nodes[child].add_parent(nodes[parent])
+        try:
+            start = time.time()
+            data = pickle.dumps(nodes, pickle.HIGHEST_PROTOCOL)
+            print 'pickled in {0:.2f} s'.format(time.time() - start)
+            start = time.time()
+            pickle.loads(data)
+            print 'unpickled in {0:.2f} s'.format(time.time() - start)
+        except RuntimeError as err:
+            print 'pickle failed:', err
+    else:
+        unittest.main()
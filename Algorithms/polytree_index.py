@@ -0,0 +1,338 @@
+import sys
+import time
+import unittest
+import numpy as np
+
+from polytree import Node, all_nodes, bfs_iterative, dfs_iterative
+
+'''Read-only snapshot of a PolyTree in compressed sparse row (CSR) arrays.
+
+The polytree.Node objects are convenient to build a graph, but each
+traversal step goes through get_linked_nodes and python lists.
+PolyTreeIndex.freeze numbers the nodes 0 to n-1, and stores the links
+of each type ("children", "parents", "undirected") in two arrays:
+
+  indices[indptr[i]:indptr[i+1]]   ids of the nodes linked to node i
+
+in the same order as in the node lists, so that the traversals give
+the same order as the ones of the polytree module.
+
+The breadth first search is level-synchronous: the whole next level is
+computed from the current one with a few numpy operations, instead of
+one python iteration per node. The visited nodes are kept in a boolean
+array owned by the traversal.
+
+The index is not updated when the nodes change: it must be frozen again.
+'''
+
+LINKTYPES = ('children', 'parents', 'undirected')
+
+
+def _csr(links):
+    '''Returns: indptr, indices arrays, from the list of
+    the linked ids of each node.'''
+    indptr = np.zeros(len(links) + 1, dtype=np.int64)
+    np.cumsum([len(ids) for ids in links], out=indptr[1:])
+    indices = np.fromiter((i for ids in links for i in ids), dtype=np.int32,
+                          count=indptr[-1])
+    return indptr, indices
+
+
+def _csr_from_edges(sources, targets, nnodes):
+    '''Returns: indptr, indices arrays, from edge arrays.
+    The links of each node are in the order of the edges.'''
+    order = np.argsort(sources, kind='mergesort')
+    indptr = np.zeros(nnodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=nnodes), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
+
+
+def _first_occurrences(ids):
+    '''Returns: ids without duplicates, in the order of the first occurrence.'''
+    unique, first = np.unique(ids, return_index=True)
+    return ids[np.sort(first)]
+
+
+class PolyTreeIndex(object):
+    '''
+    CSR arrays of the children, parents and undirected links of a polytree.
+    '''
+
+    def __init__(self, links, nodes=None):
+        '''constructor. Use freeze or from_edges.
+
+        links: dict linktype -> (indptr, indices)
+        nodes: list of the nodes, by id, or None
+        '''
+        self._links = links
+        self.nodes = nodes
+        self.nnodes = len(links['children'][0]) - 1
+        self._lists = dict()   # python lists for the depth first search
+        self._ids = None
+
+    @classmethod
+    def freeze(cls, nodes):
+        '''Returns: the index of the polytree made of nodes.
+
+        The nodes get the ids 0, 1, ... in the order of nodes. Nodes linked
+        to them but missing from nodes are added after them, so that
+        nodes can also be a list of roots.
+        '''
+        nodes = all_nodes(nodes)
+        ids = dict((node, i) for i, node in enumerate(nodes))
+        links = dict(
+            children=_csr([[ids[n] for n in node.children]
+                           for node in nodes]),
+            parents=_csr([[ids[n] for n in node.parents]
+                          for node in nodes]),
+            undirected=_csr([[ids[n] for n in node.undirectedlinks]
+                             for node in nodes]),
+            )
+        index = cls(links, nodes)
+        index._ids = ids
+        return index
+
+    @classmethod
+    def from_edges(cls, parents, children, nnodes=None):
+        '''Returns: the index of the polytree with the edges
+        parents[k] -> children[k], without building the nodes.
+
+        The undirected links of a node are its children, then its parents.
+        Raises: ValueError if an id is negative, or not below nnodes.
+        '''
+        parents = np.asarray(parents, dtype=np.int64)
+        children = np.asarray(children, dtype=np.int64)
+        if len(parents) != len(children):
+            raise ValueError('parents and children must have the same size')
+        max_id = int(max(parents.max(), children.max())) \
+            if len(parents) else -1
+        if nnodes is None:
+            nnodes = max_id + 1
+        elif nnodes <= max_id:
+            raise ValueError('node id {0} >= nnodes {1}'.format(max_id,
+                                                               nnodes))
+        if len(parents) and min(parents.min(), children.min()) < 0:
+            raise ValueError('negative node id')
+        links = dict(
+            children=_csr_from_edges(parents, children, nnodes),
+            parents=_csr_from_edges(children, parents, nnodes),
+            undirected=_csr_from_edges(np.concatenate((parents, children)),
+                                       np.concatenate((children, parents)),
+                                       nnodes),
+            )
+        return cls(links)
+
+    def id(self, node):
+        '''Returns: the id of a frozen node.'''
+        return self._ids[node]
+
+    def values(self, ids):
+        '''Returns: the list of the values of the nodes,
+        or the ids if the index was built without nodes.'''
+        if self.nodes is None:
+            return list(ids)
+        nodes = self.nodes
+        return [nodes[i].visit() for i in ids]
+
+    def linked(self, i, linktype):
+        '''Returns: array of the ids of the nodes linked to node i.'''
+        indptr, indices = self._links[linktype]
+        return indices[indptr[i]:indptr[i+1]]
+
+    def _expand(self, frontier, linktype):
+        '''Returns: array of the ids linked to the frontier nodes,
+        in the order of the frontier, with duplicates.'''
+        indptr, indices = self._links[linktype]
+        starts = indptr[frontier]
+        lengths = indptr[frontier + 1] - starts
+        # position in indices of each link: start of the node + rank
+        # of the link within the node
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(starts - offsets,
+                                                         lengths)
+        return indices[positions]
+
+    def bfs_levels(self, sources, linktype='children'):
+        '''breadth first search, level-synchronous implementation.
+        Returns: list of arrays, the ids of the nodes of each level.'''
+        visited = np.zeros(self.nnodes, dtype=bool)
+        frontier = _first_occurrences(np.asarray(sources, dtype=np.int64))
+        levels = []
+        while len(frontier):
+            visited[frontier] = True
+            levels.append(frontier)
+            linked = self._expand(frontier, linktype)
+            frontier = _first_occurrences(linked[~visited[linked]])
+        return levels
+
+    def bfs(self, sources, linktype='children'):
+        '''Returns: array of ids in the order of polytree.bfs_iterative.'''
+        levels = self.bfs_levels(sources, linktype)
+        if not levels:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(levels)
+
+    def reachable(self, sources, linktype='children'):
+        '''Returns: sorted array of the ids of the nodes reachable from
+        sources, including them. Same as bfs, without keeping the order,
+        so that the duplicates are removed without sorting.'''
+        visited = np.zeros(self.nnodes, dtype=bool)
+        # owner[i] is the position of node i in the next frontier
+        owner = np.empty(self.nnodes, dtype=np.int64)
+        frontier = np.unique(np.asarray(sources, dtype=np.int64))
+        visited[frontier] = True
+        while len(frontier):
+            linked = self._expand(frontier, linktype)
+            linked = linked[~visited[linked]]
+            visited[linked] = True
+            # one of the positions of each duplicated node is kept
+            positions = np.arange(len(linked))
+            owner[linked] = positions
+            frontier = linked[owner[linked] == positions]
+        return np.flatnonzero(visited)
+
+    def dfs(self, root, linktype='children'):
+        '''depth first search iterative implementation.
+        Returns: list of ids in the order of polytree.dfs_iterative.'''
+        if linktype not in self._lists:
+            indptr, indices = self._links[linktype]
+            self._lists[linktype] = indptr.tolist(), indices.tolist()
+        indptr, indices = self._lists[linktype]
+        visited = bytearray(self.nnodes)
+        result = []
+        todo = [root]
+        while todo:
+            i = todo.pop()
+            if visited[i]:
+                continue
+            visited[i] = 1
+            result.append(i)
+            for j in reversed(indices[indptr[i]:indptr[i+1]]):
+                if not visited[j]:
+                    todo.append(j)
+        return result
+
+    def __len__(self):
+        '''Number of nodes.'''
+        return self.nnodes
+
+    def __repr__(self):
+        return 'PolyTreeIndex: {n} nodes, {e} edges'.format(
+            n=self.nnodes, e=len(self._links['children'][1]))
+
+
+class PolyTreeIndexTestCase( unittest.TestCase ):
+
+    def setUp(self):
+        '''
+        same polytree as in polytree.TreeTestCase, 0 and 8 are roots
+
+        8
+         \\
+          9
+           \\
+            4
+           /
+          1--5--7
+         / \\
+        0--2  6
+         \\
+          3
+        '''
+        self.nodes = dict( (i, Node(i) ) for i in range(10) )
+        for parent, child in [(0, 1), (0, 2), (0, 3), (1, 4), (1, 5),
+                              (1, 6), (5, 7), (8, 9), (9, 4)]:
+            self.nodes[parent].add_child(self.nodes[child])
+            self.nodes[child].add_parent(self.nodes[parent])
+        self.index = PolyTreeIndex.freeze(self.nodes[i] for i in range(10))
+
+    def test_freeze(self):
+        self.assertEqual(len(self.index), 10)
+        self.assertEqual(self.index.linked(1, 'children').tolist(), [4, 5, 6])
+        self.assertEqual(self.index.linked(4, 'parents').tolist(), [1, 9])
+        self.assertEqual(self.index.linked(1, 'undirected').tolist(),
+                         [0, 4, 5, 6])
+        self.assertEqual(self.index.id(self.nodes[7]), 7)
+
+    def test_freeze_from_root(self):
+        index = PolyTreeIndex.freeze([self.nodes[0]])
+        self.assertEqual(len(index), 10)
+        self.assertEqual(sorted(index.values(range(10))), range(10))
+
+    def test_bfs(self):
+        for linktype, start in [('children', 0), ('parents', 7),
+                                ('undirected', 1)]:
+            expected = []
+            bfs_iterative([self.nodes[start]], expected, linktype)
+            ids = self.index.bfs([start], linktype)
+            self.assertEqual(self.index.values(ids), expected)
+        levels = self.index.bfs_levels([0])
+        self.assertEqual([level.tolist() for level in levels],
+                         [[0], [1, 2, 3], [4, 5, 6], [7]])
+
+    def test_dfs(self):
+        for linktype, start in [('children', 0), ('parents', 4),
+                                ('undirected', 4)]:
+            expected = []
+            dfs_iterative(self.nodes[start], expected, linktype)
+            ids = self.index.dfs(start, linktype)
+            self.assertEqual(self.index.values(ids), expected)
+
+    def test_reachable(self):
+        self.assertEqual(self.index.reachable([1]).tolist(), [1, 4, 5, 6, 7])
+        self.assertEqual(self.index.reachable([4], 'parents').tolist(),
+                         [0, 1, 4, 8, 9])
+        self.assertEqual(self.index.reachable([7, 3]).tolist(), [3, 7])
+        self.assertEqual(self.index.reachable([2], 'undirected').tolist(),
+                         range(10))
+
+    def test_from_edges(self):
+        index = PolyTreeIndex.from_edges([0, 0, 0, 1, 1, 1, 5, 8, 9],
+                                         [1, 2, 3, 4, 5, 6, 7, 9, 4])
+        self.assertEqual(len(index), 10)
+        for linktype in LINKTYPES:
+            self.assertEqual(index.bfs([0], linktype).tolist(),
+                             self.index.bfs([0], linktype).tolist())
+            self.assertEqual(index.reachable([4], linktype).tolist(),
+                             self.index.reachable([4], linktype).tolist())
+        self.assertEqual(index.values([3, 1]), [3, 1])
+        self.assertEqual(len(PolyTreeIndex.from_edges([0], [1], 5)), 5)
+        self.assertEqual(len(PolyTreeIndex.from_edges([], [])), 0)
+        self.assertRaises(ValueError, PolyTreeIndex.from_edges, [0, 1],
+                          [1, 2], 2)
+        self.assertRaises(ValueError, PolyTreeIndex.from_edges, [0], [-1])
+        self.assertRaises(ValueError, PolyTreeIndex.from_edges, [0], [1, 2])
+
+
+def random_polytree(nnodes, seed=0):
+    '''Returns: parents, children arrays of the edges of a random
+    polytree: each node has a random parent among the previous ones,
+    and one node out of 5 has a second parent.'''
+    rand = np.random.RandomState(seed)
+    children = np.arange(1, nnodes)
+    parents = (rand.random_sample(nnodes - 1) * children).astype(np.int64)
+    extra = children[rand.random_sample(nnodes - 1) < 0.2]
+    extra_parents = (rand.random_sample(len(extra)) * extra).astype(np.int64)
+    return (np.concatenate((parents, extra_parents)),
+            np.concatenate((children, extra)))
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        # python polytree_index.py 1000000
+        # reachability queries on a random polytree
+        nnodes = int(sys.argv[1])
+        parents, children = random_polytree(nnodes)
+        start = time.time()
+        index = PolyTreeIndex.from_edges(parents, children, nnodes)
+        print index, 'built in {0:.3f} s'.format(time.time() - start)
+        for linktype, source in [('children', nnodes // 1000),
+                                 ('parents', nnodes - 1),
+                                 ('undirected', 0)]:
+            start = time.time()
+            reached = index.reachable([source], linktype)
+            print '{0:10} from {1}: {2} nodes in {3:.1f} ms'.format(
+                linktype, source, len(reached), (time.time() - start) * 1e3)
+    else:
+        unittest.main()
@@ -0,0 +1,314 @@
+import sys
+import time
+import unittest
+import threading
+import traceback
+from Queue import Queue, Empty
+from collections import namedtuple
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+
+from polytree import Node, all_nodes
+
+'''Parallel execution of a PolyTree seen as a dependency graph.
+
+Each node does some work in its visit function, and can only start when
+all of its parents are done. The nodes are run by a pool of workers, as
+soon as they are ready (Kahn's algorithm): each node counts its parents
+not done yet, and when a node is done, the count of each of its children
+is decremented. The children reaching 0 are sent to the pool.
+Therefore, independent branches run at the same time.
+
+With threads, the work should release the GIL (I/O, numpy...).
+With processes, the workers are forked after the nodes are built, so the
+nodes are not sent to the workers: only their index is, and the value
+returned by visit is sent back.
+'''
+
+# what a node returns, when it started after the start of the schedule,
+# and how long it took, in seconds
+Result = namedtuple('Result', ['value', 'start', 'seconds'])
+
+
+class TaskError(Exception):
+    '''Exception raised in the visit function of a node.
+    node: the node
+    details: the traceback of the exception in the worker'''
+
+    def __init__(self, node, details):
+        super(TaskError, self).__init__(
+            'visit of {node} failed:\n{details}'.format(
+                node=node.value, details=details))
+        self.node = node
+        self.details = details
+
+
+def _run(node, origin):
+    '''Returns: (value, start, seconds, traceback or None).'''
+    start = time.time()
+    try:
+        value = node.visit()
+        error = None
+    except Exception:
+        value = None
+        error = traceback.format_exc()
+    return value, start - origin, time.time() - start, error
+
+
+# nodes of the schedule, in a worker process
+_nodes = []
+
+
+def _init_worker(nodes):
+    '''initializer of the worker processes. The workers are forked, so
+    that the nodes are inherited, not pickled.'''
+    global _nodes
+    _nodes = nodes
+
+
+def _run_index(index, origin):
+    '''runs _nodes[index] in a worker process.'''
+    return _run(_nodes[index], origin)
+
+
+def schedule(nodes, workers=None, processes=False):
+    '''Run the visit function of all nodes, each node after its parents.
+
+    nodes: nodes of the polytree. The nodes linked to them are run too,
+    so that the roots are enough.
+    workers: number of workers, defaults to the number of CPUs
+    processes: True for a pool of processes, False for threads
+
+    Returns: dict node -> Result.
+    Raises: TaskError if a visit raises, after the running nodes are done.
+    ValueError if the nodes have a cycle.
+    '''
+    nodes = all_nodes(nodes)
+    index = dict((node, i) for i, node in enumerate(nodes))
+    # number of parents not done for each node
+    pending = [0] * len(nodes)
+    for node in nodes:
+        for child in node.children:
+            pending[index[child]] += 1
+    # indices of the nodes done. A task failing outside of _run, e.g. with
+    # a value that cannot be pickled, does not call the callback: it is
+    # found with the AsyncResult of the task, when done.get times out.
+    done = Queue()
+    running = dict()    # index -> AsyncResult
+    results = dict()
+    origin = time.time()
+    if processes:
+        pool = Pool(workers, initializer=_init_worker, initargs=(nodes,))
+    else:
+        pool = ThreadPool(workers)
+    error = None
+    try:
+        def submit(i):
+            callback = lambda result: done.put(i)
+            if processes:
+                running[i] = pool.apply_async(_run_index, (i, origin),
+                                              callback=callback)
+            else:
+                running[i] = pool.apply_async(_run, (nodes[i], origin),
+                                              callback=callback)
+        for i, count in enumerate(pending):
+            if count == 0:
+                submit(i)
+        while running:
+            try:
+                finished = [done.get(timeout=0.1)]
+            except Empty:
+                finished = [i for i, result in running.iteritems()
+                            if result.ready()]
+            for i in finished:
+                if i not in running:
+                    # the callback puts i before the result is ready: i was
+                    # already found ready after a timeout
+                    continue
+                try:
+                    value, start, seconds, details = running.pop(i).get()
+                except Exception:
+                    details = traceback.format_exc()
+                node = nodes[i]
+                if details is not None:
+                    # not starting anything new
+                    error = error or TaskError(node, details)
+                    continue
+                results[node] = Result(value, start, seconds)
+                if error:
+                    continue
+                for child in node.children:
+                    j = index[child]
+                    pending[j] -= 1
+                    if pending[j] == 0:
+                        submit(j)
+    finally:
+        pool.close()
+        pool.join()
+    if error:
+        raise error
+    if len(results) < len(nodes):
+        raise ValueError('the nodes have a cycle')
+    return results
+
+
+class _SleepNode(Node):
+    '''Node sleeping for value seconds.'''
+
+    def visit(self):
+        time.sleep(self.value)
+        return self.value
+
+
+class _Counter(object):
+    '''Number of visits running at the same time, and its maximum.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+
+class _CountingNode(Node):
+    '''Node counting its visit in the _Counter value, for threads.'''
+
+    def visit(self):
+        counter = self.value
+        with counter.lock:
+            counter.running += 1
+            counter.peak = max(counter.peak, counter.running)
+        time.sleep(0.05)
+        with counter.lock:
+            counter.running -= 1
+
+
+class _SquareNode(Node):
+
+    def visit(self):
+        if self.value < 0:
+            raise ValueError('negative value')
+        return self.value ** 2
+
+
+class _CountNode(Node):
+    '''Node counting up to value, to keep a CPU busy.'''
+
+    def visit(self):
+        count = 0
+        for i in xrange(self.value):
+            count += 1
+        return count
+
+
+class _LambdaNode(Node):
+
+    def visit(self):
+        return lambda: self.value
+
+
+def set_link(parent, child):
+    '''set the parents child links'''
+    parent.add_child(child)
+    child.add_parent(parent)
+
+
+class SchedulerTestCase( unittest.TestCase ):
+
+    def build(self, node_class, values):
+        '''
+        0 and 5 are roots, 3 has 2 parents
+
+        0   5
+        |\\  |
+        1 2 |
+        |/ \\|
+        3   4
+        '''
+        nodes = [node_class(value) for value in values]
+        for parent, child in [(0, 1), (0, 2), (1, 3), (2, 3), (2, 4), (5, 4)]:
+            set_link(nodes[parent], nodes[child])
+        return nodes
+
+    def check_order(self, nodes, results):
+        for node in nodes:
+            for parent in node.parents:
+                end = results[parent].start + results[parent].seconds
+                self.assertGreaterEqual(results[node].start, end)
+
+    def test_threads(self):
+        nodes = self.build(_SleepNode, [0.01, 0.1, 0.01, 0.01, 0.01, 0.02])
+        results = schedule([nodes[0], nodes[5]], workers=4)
+        self.assertEqual(len(results), 6)
+        self.check_order(nodes, results)
+        self.assertEqual(results[nodes[1]].value, 0.1)
+        self.assertGreaterEqual(results[nodes[1]].seconds, 0.1)
+        # 4 starts with 2 and 5 done, before 1 is done
+        self.assertLess(results[nodes[4]].start, results[nodes[3]].start)
+
+    def test_parallel(self):
+        counter = _Counter()
+        nodes = [_CountingNode(counter) for i in range(4)]
+        schedule(nodes, workers=4)
+        # the visits overlap, whatever the load of the machine
+        self.assertGreaterEqual(counter.peak, 2)
+        self.assertEqual(counter.running, 0)
+
+    def test_processes(self):
+        nodes = self.build(_SquareNode, range(6))
+        results = schedule(nodes, workers=2, processes=True)
+        self.assertEqual([results[node].value for node in nodes],
+                         [i ** 2 for i in range(6)])
+        self.check_order(nodes, results)
+
+    def test_error(self):
+        for processes in [False, True]:
+            nodes = self.build(_SquareNode, [0, 1, -2, 3, 4, 5])
+            try:
+                schedule(nodes, workers=2, processes=processes)
+                self.fail('no TaskError')
+            except TaskError as err:
+                self.assertIs(err.node, nodes[2])
+                self.assertIn('negative value', err.details)
+
+    def test_unpicklable(self):
+        # the value cannot be sent back by the worker process
+        nodes = [_LambdaNode(i) for i in range(3)]
+        set_link(nodes[0], nodes[1])
+        try:
+            schedule(nodes, workers=2, processes=True)
+            self.fail('no TaskError')
+        except TaskError as err:
+            self.assertIn(err.node, nodes)
+
+    def test_concurrent(self):
+        # two schedules with processes at the same time
+        nodes = [self.build(_SquareNode, range(6)),
+                 self.build(_SquareNode, range(10, 16))]
+        results = ThreadPool(2).map(
+            lambda nodes: schedule(nodes, workers=2, processes=True), nodes)
+        for nodes, result in zip(nodes, results):
+            self.assertEqual([result[node].value for node in nodes],
+                             [node.value ** 2 for node in nodes])
+
+    def test_cycle(self):
+        nodes = self.build(_SquareNode, range(6))
+        set_link(nodes[3], nodes[0])
+        self.assertRaises(ValueError, schedule, nodes, 2)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        # python polytree_scheduler.py 10000000
+        # independent branches of CPU-bound nodes, with 1 worker and
+        # with one worker per CPU
+        count = int(sys.argv[1])
+        for workers in sorted(set([1, cpu_count()])):
+            roots = [_CountNode(count) for i in range(cpu_count())]
+            for root in roots:
+                set_link(root, _CountNode(count))
+            start = time.time()
+            schedule(roots, workers, processes=True)
+            print '{0} workers: {1:.2f} s'.format(workers, time.time() - start)
+    else:
+        unittest.main()
@@ -56,11 +56,11 @@ class Node(object):
         self.undirectedlinks.append(parent)
 
     def get_linked_nodes(self, type):  #ask colin, I imagine there is a more elegant Python way to do this
-        if (type is "children"):
+        if type == "children":
             return self.children
-        if(type is "parents"):
+        if type == "parents":
             return self.parents
-        if(type is "undirected"):
+        if type == "undirected":
             return self.undirectedlinks
 
     def __repr__(self):
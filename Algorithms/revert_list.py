@@ -1,24 +1,25 @@
 
-from linkedlist import Node, build_list, print_list
+import sys
+import unittest
+from linkedlist import Node, build_list, print_list, iterate
 
 def revert_iterative(root):
+    '''in place, without recursion.
+    Returns: the new root, the last node of the list.'''
     parent = None
     node = root
-    child = root.child
-    while 1:
+    while node is not None:
+        child = node.child
         # reverting
         node.child = parent
         # one more step
         parent = node
         node = child
-        if child is None:
-            break
-        else:
-            child = child.child
     return parent
 
 
 def revert_recursive(root, parent):
+    '''reaches the recursion limit for lists longer than ~1000 nodes.'''
     newroot = None
     if root.child:
         newroot = revert_recursive(root.child, root)
@@ -26,7 +27,30 @@ def revert_recursive(root, parent):
         newroot = root
     root.child = parent
     return newroot
-    
+
+
+class RevertTestCase( unittest.TestCase ):
+
+    def values(self, root):
+        return [node.value for node in iterate(root)]
+
+    def test_iterative(self):
+        self.assertEqual(self.values(revert_iterative(build_list(5))),
+                         [4, 3, 2, 1, 0])
+        self.assertEqual(self.values(revert_iterative(build_list(1))), [0])
+        self.assertEqual(revert_iterative(None), None)
+
+    def test_recursive(self):
+        self.assertEqual(self.values(revert_recursive(build_list(5), None)),
+                         [4, 3, 2, 1, 0])
+
+    def test_long_list(self):
+        # no recursion
+        root = revert_iterative(build_list(100000))
+        self.assertEqual(root.value, 99999)
+        self.assertEqual(self.values(revert_iterative(root)), range(100000))
+
+
 if __name__ == '__main__':
 
     import pprint 
@@ -41,3 +65,11 @@ if __name__ == '__main__':
     newroot = revert_recursive(newroot, None)
     print_list(newroot)
     print
+
+    if len(sys.argv) > 1:
+        # python revert_list.py 1000000
+        root = build_list(int(sys.argv[1]))
+        newroot = revert_iterative(root)
+        print newroot, newroot.child
+    else:
+        unittest.main()
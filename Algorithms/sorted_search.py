@@ -0,0 +1,249 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from binary_search import binary_search
+
+'''Binary search of batches of queries in sorted arrays and files.
+
+binary_search.binary_search looks for one element with a python loop.
+Here, a batch of queries is searched with one call to numpy.searchsorted:
+
+  lower_bound  first position i such that keys[i] >= query
+  upper_bound  first position i such that keys[i] > query
+
+so that keys[lower_bound:upper_bound] are the keys equal to the query,
+and find returns the position of a key equal to each query, or -1.
+
+The keys can be a numpy.memmap of a file written by write_sorted: only
+the pages of the file visited by the searches are read, and a file
+larger than the memory can be searched. The queries are sorted before
+the search, as numpy.searchsorted narrows the search of a query with the
+result of the previous one when they are increasing: consecutive
+queries then visit the same pages of the keys.
+'''
+
+DTYPE = '<i8'
+
+
+def _presorted(keys, queries, side):
+    '''Returns: np.searchsorted(keys, queries, side), searching
+    the queries in increasing order.'''
+    queries = np.asarray(queries)
+    if queries.ndim != 1 or len(queries) < 2 or \
+            (queries[1:] >= queries[:-1]).all():
+        return np.searchsorted(keys, queries, side)
+    order = np.argsort(queries, kind='mergesort')
+    result = np.empty(len(queries), dtype=np.intp)
+    result[order] = np.searchsorted(keys, queries[order], side)
+    return result
+
+
+def search(keys, queries, side='left'):
+    '''Returns: array of the positions at which the queries would be
+    inserted in the sorted keys, keeping them sorted, as
+    numpy.searchsorted.
+    side: 'left' for the first possible position, 'right' for the last.'''
+    if side not in ('left', 'right'):
+        raise ValueError('side must be left or right')
+    return _presorted(keys, queries, side)
+
+
+def lower_bound(keys, queries):
+    '''Returns: array of the positions of the first key >= each query.'''
+    return search(keys, queries, 'left')
+
+
+def upper_bound(keys, queries):
+    '''Returns: array of the positions of the first key > each query.'''
+    return search(keys, queries, 'right')
+
+
+def find(keys, queries):
+    '''Returns: array of the positions of the first key equal to each
+    query, -1 for the queries not in the keys.'''
+    queries = np.asarray(queries)
+    positions = lower_bound(keys, queries)
+    if len(keys) == 0:
+        return np.full(queries.shape, -1, dtype=np.intp)
+    # the keys found, the last one for the queries after all keys
+    found = np.asarray(keys[np.minimum(positions, len(keys) - 1)])
+    return np.where(found == queries, positions, -1)
+
+
+def count(keys, queries):
+    '''Returns: array of the number of keys equal to each query.'''
+    return upper_bound(keys, queries) - lower_bound(keys, queries)
+
+
+def is_sorted(keys, chunk=1 << 20):
+    '''Returns: True if the keys are sorted. The keys are read chunk by
+    chunk, so that a memmap is not loaded in memory at once.'''
+    for start in xrange(0, len(keys), chunk):
+        # one key of overlap with the previous chunk
+        part = np.asarray(keys[max(start - 1, 0):start + chunk])
+        if (part[1:] < part[:-1]).any():
+            return False
+    return True
+
+
+def write_sorted(filename, chunks, dtype=DTYPE):
+    '''Writes sorted keys to a raw binary file, one chunk after the other,
+    so that the keys do not need to be in memory at once.
+
+    chunks: iterable of arrays or lists of keys, the keys of all chunks
+    being sorted.
+
+    Returns: number of keys written.
+    Raises: ValueError if the keys are not sorted.
+    '''
+    nkeys = 0
+    last = None
+    with open(filename, 'wb') as ofile:
+        for chunk in chunks:
+            chunk = np.asarray(chunk, dtype=dtype)
+            if not len(chunk):
+                continue
+            if (last is not None and chunk[0] < last) or \
+                    (chunk[1:] < chunk[:-1]).any():
+                break
+            chunk.tofile(ofile)
+            last = chunk[-1]
+            nkeys += len(chunk)
+        else:
+            return nkeys
+    # not leaving a file with only the first keys
+    os.remove(filename)
+    raise ValueError('the keys are not sorted')
+
+
+def open_sorted(filename, dtype=DTYPE):
+    '''Returns: read-only numpy.memmap of a file of sorted keys
+    written by write_sorted with the same dtype.'''
+    dtype = np.dtype(dtype)
+    size = os.path.getsize(filename)
+    if size % dtype.itemsize:
+        raise ValueError('{0} is not a file of {1} keys'.format(filename,
+                                                                dtype))
+    if size == 0:
+        # mmap cannot map an empty file
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode='r')
+
+
+class SortedSearchTestCase( unittest.TestCase ):
+
+    def setUp(self):
+        self.keys = np.array([1, 3, 3, 3, 5, 8, 13])
+        self.queries = [5, 0, 3, 14, 4, 13, 1]
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check(self, keys):
+        self.assertEqual(lower_bound(keys, self.queries).tolist(),
+                         [4, 0, 1, 7, 4, 6, 0])
+        self.assertEqual(upper_bound(keys, self.queries).tolist(),
+                         [5, 0, 4, 7, 4, 7, 1])
+        self.assertEqual(find(keys, self.queries).tolist(),
+                         [4, -1, 1, -1, -1, 6, 0])
+        self.assertEqual(count(keys, self.queries).tolist(),
+                         [1, 0, 3, 0, 0, 1, 1])
+
+    def test_search(self):
+        self.check(self.keys)
+        for side in ['left', 'right']:
+            self.assertEqual(search(self.keys, self.queries, side).tolist(),
+                             np.searchsorted(self.keys, self.queries,
+                                             side).tolist())
+        self.assertEqual(lower_bound(self.keys, 8), 5)
+        self.assertRaises(ValueError, search, self.keys, self.queries, 'up')
+
+    def test_scalar(self):
+        # same positions as binary_search, for keys without duplicates
+        keys = range(0, 100, 3)
+        queries = range(-1, 101)
+        expected = [binary_search(keys, query) for query in queries]
+        expected = [-1 if index is None else index for index in expected]
+        self.assertEqual(find(np.array(keys), queries).tolist(), expected)
+
+    def test_empty(self):
+        keys = np.zeros(0, dtype=np.int64)
+        self.assertEqual(find(keys, [1, 2]).tolist(), [-1, -1])
+        self.assertEqual(count(keys, [1]).tolist(), [0])
+
+    def test_file(self):
+        filename = os.path.join(self.tmpdir, 'keys')
+        nkeys = write_sorted(filename, [self.keys[:3], [], self.keys[3:]])
+        self.assertEqual(nkeys, len(self.keys))
+        keys = open_sorted(filename)
+        self.assertIsInstance(keys, np.memmap)
+        self.assertTrue(is_sorted(keys, chunk=2))
+        self.check(keys)
+        self.assertRaises(ValueError, write_sorted, filename, [[3, 4], [2]])
+        self.assertFalse(os.path.exists(filename))
+        write_sorted(filename, [[1, 2, 3]], dtype='<i2')
+        self.assertEqual(open_sorted(filename, '<i2').tolist(), [1, 2, 3])
+        self.assertRaises(ValueError, open_sorted, filename)
+
+    def test_empty_file(self):
+        filename = os.path.join(self.tmpdir, 'empty')
+        self.assertEqual(write_sorted(filename, []), 0)
+        self.assertEqual(len(open_sorted(filename)), 0)
+
+    def test_is_sorted(self):
+        self.assertTrue(is_sorted(self.keys, chunk=3))
+        self.assertFalse(is_sorted(np.array([1, 2, 3, 2, 4]), chunk=3))
+        self.assertTrue(is_sorted([]))
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        # python sorted_search.py 100000000 1000000
+        # keys 0, 2, 4... in memory and in a file, random queries
+        nkeys = int(sys.argv[1])
+        nqueries = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        rand = np.random.RandomState(0)
+        queries = rand.randint(0, 2 * nkeys, nqueries)
+
+        # binary_search on a list would need the keys in memory
+        keys = xrange(0, 2 * nkeys, 2)
+        sample = queries[:min(nqueries, 100000)].tolist()
+        start = time.time()
+        for query in sample:
+            binary_search(keys, query)
+        elapsed = time.time() - start
+        print '{0:32} {1:.3f} s, {2:.2f} us per query'.format(
+            'binary_search, xrange', elapsed, elapsed / len(sample) * 1e6)
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'keys')
+            chunk = 1 << 22
+            write_sorted(filename, (np.arange(2 * i, 2 * min(i + chunk, nkeys),
+                                              2)
+                                    for i in xrange(0, nkeys, chunk)))
+            for name, keys in [('array', np.arange(0, 2 * nkeys, 2)),
+                               ('memmap', open_sorted(filename))]:
+                start = time.time()
+                np.searchsorted(keys, queries)
+                elapsed = time.time() - start
+                print '{0:32} {1:.3f} s, {2:.3f} us per query'.format(
+                    'searchsorted, unsorted, ' + name, elapsed,
+                    elapsed / nqueries * 1e6)
+                start = time.time()
+                found = find(keys, queries)
+                elapsed = time.time() - start
+                print '{0:32} {1:.3f} s, {2:.3f} us per query'.format(
+                    'find, ' + name, elapsed, elapsed / nqueries * 1e6)
+                del keys
+        finally:
+            shutil.rmtree(tmpdir)
+    else:
+        unittest.main()
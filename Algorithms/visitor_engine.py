@@ -0,0 +1,303 @@
+import sys
+import time
+import unittest
+from collections import deque
+
+import tree_visitor_pattern
+import polytree_visitor_pattern
+
+'''Visitor engine: traversals driving a visitor, without double dispatch.
+
+In tree_visitor_pattern and polytree_visitor_pattern, each node is
+visited with two python calls, node.accept(visitor) and then
+visitor.visit(node), and the traversals recurse once per node or per level,
+so that a deep tree reaches the recursion limit.
+
+Here, the engine owns the traversal, with an explicit stack or queue,
+and calls the visitor directly. The handler of the visitor for a node
+class is found once, and cached:
+- visit_<class name> for the class of the node or one of its base classes,
+- otherwise visit.
+Like with accept, the visitor can therefore depend on the type of the node.
+
+A batch visitor has a visit_level method, which receives the list of the
+nodes of each level of the breadth first search, e.g. to process them
+with numpy, or to send them to a pool of workers.
+
+The nodes are those of the visitor pattern modules, or any object with
+a list of linked nodes: "children", "parents" or "undirected" (the
+undirectedlinks attribute of the polytree nodes). The visited nodes are
+kept in a set owned by the traversal, which can be turned off for trees.
+'''
+
+LINKS = dict(children='children', parents='parents',
+             undirected='undirectedlinks')
+
+# (visitor class, node class) -> name of the handler
+_handler_names = dict()
+
+
+def handler_name(visitor_class, node_class):
+    '''Returns: name of the method of visitor_class visiting node_class.'''
+    key = visitor_class, node_class
+    name = _handler_names.get(key)
+    if name is None:
+        for klass in node_class.__mro__:
+            name = 'visit_' + klass.__name__
+            if hasattr(visitor_class, name):
+                break
+        else:
+            name = 'visit'
+            if not hasattr(visitor_class, name):
+                raise TypeError('{0} cannot visit {1}'.format(
+                    visitor_class.__name__, node_class.__name__))
+        _handler_names[key] = name
+    return name
+
+
+class _Handlers(object):
+    '''Handlers of a visitor, for one traversal.
+    Consecutive nodes are mostly of the same class, so the last handler
+    is kept, and the dict is only used when the class changes.'''
+
+    def __init__(self, visitor):
+        self.visitor = visitor
+        self.handlers = dict()
+
+    def get(self, node_class):
+        '''Returns: the bound method of the visitor for node_class.'''
+        handler = self.handlers.get(node_class)
+        if handler is None:
+            handler = getattr(self.visitor,
+                              handler_name(type(self.visitor), node_class))
+            self.handlers[node_class] = handler
+        return handler
+
+
+class VisitorEngine(object):
+    '''
+    Traversals of the nodes linked by linktype,
+    "children", "parents" or "undirected".
+    track_visited can be False for trees, in which a node has one parent.
+    '''
+
+    def __init__(self, linktype='children', track_visited=True):
+        self.links = LINKS[linktype]
+        self.track_visited = track_visited
+
+    def depth_first(self, roots, visitor):
+        '''depth first search, iterative implementation,
+        in the same order as tree_visitor_pattern.DepthFirstSearch.
+        Returns: visitor.'''
+        links = self.links
+        handlers = _Handlers(visitor)
+        node_class = handler = None
+        visited = set() if self.track_visited else None
+        todo = list(roots)[::-1]
+        pop = todo.pop
+        extend = todo.extend
+        while todo:
+            node = pop()
+            if visited is not None:
+                if node in visited:
+                    continue
+                visited.add(node)
+            if node.__class__ is not node_class:
+                node_class = node.__class__
+                handler = handlers.get(node_class)
+            handler(node)
+            extend(getattr(node, links)[::-1])
+        return visitor
+
+    def levels(self, roots):
+        '''Yields: the list of the nodes of each level
+        of the breadth first search.'''
+        links = self.links
+        visited = set() if self.track_visited else None
+        level = list(roots)
+        while level:
+            if visited is not None:
+                unique = []
+                for node in level:
+                    if node not in visited:
+                        visited.add(node)
+                        unique.append(node)
+                level = unique
+                if not level:
+                    return
+            yield level
+            next_level = []
+            for node in level:
+                next_level.extend(getattr(node, links))
+            level = next_level
+
+    def breadth_first(self, roots, visitor):
+        '''breadth first search, iterative implementation using a deque,
+        in the same order as tree_visitor_pattern.BreadthFirstSearch.
+        Returns: visitor.'''
+        links = self.links
+        handlers = _Handlers(visitor)
+        node_class = handler = None
+        visited = set() if self.track_visited else None
+        todo = deque(roots)
+        popleft = todo.popleft
+        extend = todo.extend
+        while todo:
+            node = popleft()
+            if visited is not None:
+                if node in visited:
+                    continue
+                visited.add(node)
+            if node.__class__ is not node_class:
+                node_class = node.__class__
+                handler = handlers.get(node_class)
+            handler(node)
+            extend(getattr(node, links))
+        return visitor
+
+    def breadth_first_batch(self, roots, visitor):
+        '''breadth first search, calling visitor.visit_level(nodes)
+        once for each level.
+        Returns: visitor.'''
+        visit_level = visitor.visit_level
+        for level in self.levels(roots):
+            visit_level(level)
+        return visitor
+
+
+class ValueCollector(object):
+    '''Visitor collecting the values of the nodes.'''
+
+    def __init__(self):
+        self.result = []
+
+    def visit(self, node):
+        self.result.append(node.value)
+
+
+class LevelCollector(object):
+    '''Batch visitor collecting the values of the nodes, level by level.'''
+
+    def __init__(self):
+        self.levels = []
+
+    def visit_level(self, nodes):
+        self.levels.append([node.value for node in nodes])
+
+
+class VisitorEngineTestCase( unittest.TestCase ):
+
+    def setUp(self):
+        '''same trees as in the visitor pattern modules'''
+        Node = tree_visitor_pattern.Node
+        self.nodes = dict( (i, Node(i) ) for i in range(8) )
+        self.nodes[0].set_children( [self.nodes[1], self.nodes[2], self.nodes[3]])
+        self.nodes[1].set_children( [self.nodes[4], self.nodes[5] ,self.nodes[6]])
+        self.nodes[5].set_children( [self.nodes[7]])
+        self.root = self.nodes[0]
+
+        PolyNode = polytree_visitor_pattern.Node
+        self.polynodes = dict( (i, PolyNode(i) ) for i in range(10) )
+        for parent, child in [(0, 1), (0, 2), (0, 3), (1, 4), (1, 5), (1, 6),
+                              (5, 7), (8, 9), (9, 4), (3, 6)]:
+            self.polynodes[parent].add_child(self.polynodes[child])
+            self.polynodes[child].add_parent(self.polynodes[parent])
+
+    def test_depth_first(self):
+        expected = tree_visitor_pattern.DepthFirstSearch(self.root, None).result
+        for track_visited in [True, False]:
+            engine = VisitorEngine(track_visited=track_visited)
+            visitor = engine.depth_first([self.root], ValueCollector())
+            self.assertEqual(visitor.result, expected)
+
+    def test_breadth_first(self):
+        expected = tree_visitor_pattern.BreadthFirstSearch(self.root,
+                                                           None).result
+        visitor = VisitorEngine().breadth_first([self.root], ValueCollector())
+        self.assertEqual(visitor.result, expected)
+
+    def test_polytree(self):
+        for linktype in ['children', 'undirected']:
+            expected = polytree_visitor_pattern.BreadthFirstSearchIterative(
+                self.polynodes[0], linktype).result
+            visitor = VisitorEngine(linktype).breadth_first(
+                [self.polynodes[0]], ValueCollector())
+            self.assertEqual(visitor.result, expected)
+        visitor = VisitorEngine('parents').depth_first(
+            [self.polynodes[7]], ValueCollector())
+        self.assertEqual(visitor.result, [7, 5, 1, 0])
+
+    def test_levels(self):
+        visitor = VisitorEngine().breadth_first_batch([self.root],
+                                                      LevelCollector())
+        self.assertEqual(visitor.levels, [[0], [1, 2, 3], [4, 5, 6], [7]])
+        # 6 has 2 parents, and is only in the first level reached
+        visitor = VisitorEngine('undirected').breadth_first_batch(
+            [self.polynodes[3]], LevelCollector())
+        self.assertEqual(visitor.levels,
+                         [[3], [0, 6], [1, 2], [4, 5], [9, 7], [8]])
+
+    def test_handler_per_class(self):
+        class Leaf(tree_visitor_pattern.Node):
+            pass
+
+        class Visitor(ValueCollector):
+            def visit_Leaf(self, node):
+                self.result.append(-node.value)
+
+        root = tree_visitor_pattern.Node(1)
+        root.set_children([Leaf(2), tree_visitor_pattern.Node(3)])
+        visitor = VisitorEngine().depth_first([root], Visitor())
+        self.assertEqual(visitor.result, [1, -2, 3])
+        self.assertEqual(handler_name(Visitor, Leaf), 'visit_Leaf')
+        self.assertEqual(handler_name(Visitor, tree_visitor_pattern.Node),
+                         'visit')
+        self.assertRaises(TypeError, handler_name, object, Leaf)
+
+    def test_deep_tree(self):
+        # no recursion limit
+        Node = tree_visitor_pattern.Node
+        root = node = Node(0)
+        for i in range(1, 10000):
+            child = Node(i)
+            node.set_children([child])
+            node = child
+        engine = VisitorEngine(track_visited=False)
+        self.assertEqual(engine.depth_first([root], ValueCollector()).result,
+                         range(10000))
+        self.assertEqual(
+            len(engine.breadth_first_batch([root], LevelCollector()).levels),
+            10000)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        # python visitor_engine.py 100000
+        # the traversals of the visitor pattern modules, and of the engine
+        from benchmark_traversals import make_shape, build_tree, \
+            build_polytree
+        nnodes = int(sys.argv[1])
+        root = build_tree(tree_visitor_pattern.Node,
+                          make_shape('wide', nnodes, fanout=10))
+        polyroot = build_polytree(polytree_visitor_pattern.Node,
+                                  make_shape('polytree', nnodes))
+        for name, traversal in [
+                ('tree DepthFirstSearch', lambda: tree_visitor_pattern.
+                 DepthFirstSearch(root, None)),
+                ('tree engine depth_first', lambda: VisitorEngine(
+                    track_visited=False).depth_first([root], ValueCollector())),
+                ('polytree BreadthFirstSearchIterative', lambda:
+                 polytree_visitor_pattern.BreadthFirstSearchIterative(
+                     polyroot, 'undirected')),
+                ('polytree engine breadth_first', lambda: VisitorEngine(
+                    'undirected').breadth_first([polyroot], ValueCollector())),
+                ('polytree engine breadth_first_batch', lambda: VisitorEngine(
+                    'undirected').breadth_first_batch([polyroot],
+                                                      LevelCollector())),
+                ]:
+            start = time.time()
+            traversal()
+            print '{0:40} {1:.3f} s'.format(name, time.time() - start)
+    else:
+        unittest.main()